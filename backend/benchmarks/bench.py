@@ -0,0 +1,206 @@
+"""Solver and vision benchmarks over seeded corpora, reported as JSON.
+
+Run from backend/: python -m benchmarks.bench --output results.json
+Compare two runs: python -m benchmarks.bench --compare old.json new.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.corpus import CUBE_CLASSES, face_corpus, scramble_corpus
+from cv_processing import classify_medians, face_medians, process_face_image
+from search_budget import SearchBudget
+from solver_pool import load_solver_tables
+
+DEFAULT_DEPTHS = {2: [3, 6, 11], 3: [5, 10, 20], 4: [10, 40], 5: [10, 60]}
+
+# Metrics where a larger value is an improvement; everything else should shrink
+HIGHER_IS_BETTER = {"solves_per_sec", "frames_per_sec", "accuracy"}
+
+
+def _latency_stats(latencies):
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+    }
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_isolated(benchmark, args, trace_memory):
+    """Run one benchmark in this fresh process, adding its peak RSS and, when asked, the
+    peak traced Python heap (tracing slows the run down)"""
+    if not trace_memory:
+        result = benchmark(*args)
+    else:
+        tracemalloc.start()
+        result = benchmark(*args)
+        result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _measure(benchmark, args, trace_memory):
+    # Peak RSS only ever grows within a process, so each benchmark gets a new spawned one
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_run_isolated, benchmark, args, trace_memory).result()
+
+
+def solver_benchmark(size, depth, count, seed, max_ms=None):
+    load_solver_tables()
+    latencies, lengths, nodes = [], [], []
+    truncated = 0
+    for state in scramble_corpus(size, depth, count, seed):
+        cube = CUBE_CLASSES[size](state)
+        start = time.perf_counter()
+        solution = cube.solve(budget=SearchBudget(max_ms))
+        latencies.append(time.perf_counter() - start)
+        stats = solution["stats"]
+        lengths.append(stats["moves"])
+        nodes.append(stats.get("nodes", 0))
+        truncated += bool(stats.get("truncated"))
+    return {
+        "size": size,
+        "depth": depth,
+        "count": count,
+        "solves_per_sec": round(count / sum(latencies), 2),
+        **_latency_stats(latencies),
+        "avg_length": round(float(np.mean(lengths)), 2),
+        "avg_nodes": round(float(np.mean(nodes)), 1),
+        "truncated": truncated,
+    }
+
+
+def vision_benchmark(count, seed, max_dim=None):
+    faces = face_corpus(count, seed)
+    latencies = {"warp": [], "classify": [], "total": []}
+    correct = 0
+    for data, expected in faces:
+        start = time.perf_counter()
+        _, warped = process_face_image(data, max_dim)
+        warped_at = time.perf_counter()
+        colors, _ = classify_medians(face_medians(warped))
+        end = time.perf_counter()
+        latencies["warp"].append(warped_at - start)
+        latencies["classify"].append(end - warped_at)
+        latencies["total"].append(end - start)
+        correct += sum(a == b for a, b in zip(colors, expected))
+    return {
+        "count": count,
+        "max_dim": max_dim,
+        "frames_per_sec": round(count / sum(latencies["total"]), 2),
+        **_latency_stats(latencies["total"]),
+        "warp_p50_ms": _latency_stats(latencies["warp"])["p50_ms"],
+        "classify_p50_ms": _latency_stats(latencies["classify"])["p50_ms"],
+        "accuracy": round(correct / (9 * count), 4),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    # Build any missing tables once, before the benchmark processes map them
+    load_solver_tables()
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "solver": [],
+        "vision": [],
+    }
+    for size in args.sizes:
+        for depth in args.depths or DEFAULT_DEPTHS[size]:
+            result = _measure(solver_benchmark, (size, depth, args.count, args.seed, args.max_ms),
+                              args.trace_memory)
+            report["solver"].append(result)
+            print(f"{size}x{size} depth {depth:2d}: {result['solves_per_sec']:9.2f} solves/sec  "
+                  f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                  f"{result['avg_length']:5.2f} moves  {result['avg_nodes']:9.1f} nodes", file=sys.stderr)
+    for max_dim in args.max_dims:
+        result = _measure(vision_benchmark, (args.faces, args.seed, max_dim or None), args.trace_memory)
+        report["vision"].append(result)
+        print(f"vision max_dim {max_dim or 'full':>4}: {result['frames_per_sec']:8.2f} faces/sec  "
+              f"p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:6.2f} ms  "
+              f"accuracy {result['accuracy']:.3f}", file=sys.stderr)
+    return report
+
+
+def _rows(report):
+    for section, key in (("solver", ("size", "depth")), ("vision", ("max_dim",))):
+        for row in report[section]:
+            yield (section,) + tuple(row[k] for k in key), row
+
+
+def compare(old, new):
+    """Print the relative change of every shared metric, flagging regressions over 10%"""
+    old_rows = dict(_rows(old))
+    for key, row in _rows(new):
+        if key not in old_rows:
+            continue
+        for metric, value in row.items():
+            before = old_rows[key].get(metric)
+            if not isinstance(value, (int, float)) or not before or metric in ("size", "depth", "count"):
+                continue
+            change = (value - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > 0.1 else ""
+            print(f"{' '.join(map(str, key)):16} {metric:16} {before:12.3f} -> {value:12.3f} "
+                  f"({change:+.1%}){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 3])
+    parser.add_argument("--depths", type=int, nargs="+", help="scramble depths (default depends on size)")
+    parser.add_argument("--count", type=int, default=50, help="scrambles per size and depth")
+    parser.add_argument("--faces", type=int, default=50, help="rendered face images")
+    parser.add_argument("--max-dims", type=int, nargs="+", default=[0, 320],
+                        help="downscale sizes for the vision benchmark, 0 for full size")
+    parser.add_argument("--max-ms", type=int, help="time budget per solve")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the peak Python heap via tracemalloc (slows timings)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two JSON reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            compare(json.load(old), json.load(new))
+        return
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
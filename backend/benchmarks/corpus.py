@@ -0,0 +1,50 @@
+"""Seeded inputs for the benchmarks: random scrambles and rendered face photos."""
+
+import cv2
+import numpy as np
+
+from cube_solver import Cube2x2, Cube3x3, Cube4x4, Cube5x5
+from cv_processing import COLOR_MAP, COLOR_NAMES
+
+CUBE_CLASSES = {2: Cube2x2, 3: Cube3x3, 4: Cube4x4, 5: Cube5x5}
+SOLVED = {size: ''.join(face * (size * size) for face in "URFDLB") for size in CUBE_CLASSES}
+
+
+def scramble_corpus(size, depth, count, seed):
+    """count facelet strings, each a random depth-move scramble of the solved cube"""
+    states, _ = CUBE_CLASSES[size].random_states(SOLVED[size], count, depth, seed)
+    return [row.tobytes().decode("ascii") for row in states]
+
+
+def render_face(colors, rng, size=480):
+    """JPEG photo of one face: light cube body on a dark background, slightly rotated and noisy"""
+    img = np.full((size, size, 3), 20, dtype=np.uint8)
+    margin = size // 6
+    cv2.rectangle(img, (margin, margin), (size - margin, size - margin), (200, 200, 200), -1)
+    cell = (size - 2 * margin) // 3
+    gap = max(2, cell // 25)
+    for k, name in enumerate(colors):
+        i, j = divmod(k, 3)
+        r, g, b = COLOR_MAP[name]
+        top_left = (margin + j * cell + gap, margin + i * cell + gap)
+        bottom_right = (margin + (j + 1) * cell - gap, margin + (i + 1) * cell - gap)
+        cv2.rectangle(img, top_left, bottom_right, (b, g, r), -1)
+
+    rotation = cv2.getRotationMatrix2D((size / 2, size / 2), rng.uniform(-8, 8), 1.0)
+    img = cv2.warpAffine(img, rotation, (size, size), borderValue=(20, 20, 20))
+    img = img.astype(np.float32) * rng.uniform(0.85, 1.1) + rng.normal(0, 6, img.shape)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def face_corpus(count, seed, size=480):
+    """count (jpeg bytes, colors) pairs; every face has a center color that no other sticker shares"""
+    rng = np.random.default_rng(seed)
+    faces = []
+    for _ in range(count):
+        center = COLOR_NAMES[rng.integers(len(COLOR_NAMES))]
+        others = [name for name in COLOR_NAMES if name != center]
+        colors = [others[i] for i in rng.integers(len(others), size=9)]
+        colors[4] = center
+        faces.append((render_face(colors, rng, size), colors))
+    return faces
@@ -0,0 +1,137 @@
+"""Nodes/sec of a sticker-level IDDFS with list states versus CubeState bytes.
+
+Run from backend/: python -m benchmarks.state_bench
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from cube_solver import Cube2x2, Cube3x3
+from cube_state import permute
+
+
+def canonical_steps(cube_class, permutation):
+    """(index, permutation) children allowed after each move index; the last row is the root.
+
+    Both searches walk these plain lists, so they expand the same nodes and
+    differ only in how a state is stored and permuted.
+    """
+    optimizer = cube_class.move_optimizer()
+    perms = [permutation(cube_class.MOVE_TABLE[name]) for name in optimizer.names]
+    rows = [np.flatnonzero(row).tolist() for row in optimizer.allowed] + [list(range(len(perms)))]
+    return [[(j, perms[j]) for j in row] for row in rows]
+
+
+class ListStateSearch:
+    """The previous list-of-chars search, kept as the baseline"""
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.nodes = 0
+
+    def solve_phase1(self, max_depth):
+        steps = canonical_steps(type(self.cube), lambda perm: [int(i) for i in perm])
+        state = list(str(self.cube.state))
+        threshold = 0
+        visited = {''.join(state)}
+        while threshold <= max_depth:
+            distance = self._search(state, 0, threshold, visited, steps, -1)
+            if distance == 0 or distance is None:
+                return
+            threshold = distance
+
+    def _search(self, state, g, threshold, visited, steps, last):
+        self.nodes += 1
+        if g > threshold:
+            return g
+        if ''.join(state) == self.cube.solved_state:
+            return 0
+        min_cost = float('inf')
+        for i, permutation in steps[last]:
+            new_state = [state[j] for j in permutation]
+            state_str = ''.join(new_state)
+            if state_str in visited:
+                continue
+            visited.add(state_str)
+            t = self._search(new_state, g + 1, threshold, visited, steps, i)
+            if t == 0:
+                return 0
+            if t is not None and t < min_cost:
+                min_cost = t
+            visited.remove(state_str)
+        return min_cost if min_cost != float('inf') else None
+
+
+class BytesStateSearch:
+    """The same search on CubeState bytes, which also serve as visited-set keys"""
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.nodes = 0
+
+    def solve_phase1(self, max_depth):
+        steps = canonical_steps(type(self.cube), lambda perm: np.asarray(perm, dtype=np.intp))
+        start = self.cube.state.data
+        solved = self.cube.solved_state.encode("ascii")
+        threshold = 0
+        visited = {start}
+        while threshold <= max_depth:
+            distance = self._search(start, 0, threshold, visited, steps, -1, solved)
+            if distance == 0 or distance is None:
+                return
+            threshold = distance
+
+    def _search(self, state, g, threshold, visited, steps, last, solved):
+        self.nodes += 1
+        if g > threshold:
+            return g
+        if state == solved:
+            return 0
+        min_cost = float('inf')
+        for i, perm in steps[last]:
+            new_state = permute(state, perm)
+            if new_state in visited:
+                continue
+            visited.add(new_state)
+            t = self._search(new_state, g + 1, threshold, visited, steps, i, solved)
+            if t == 0:
+                return 0
+            if t is not None and t < min_cost:
+                min_cost = t
+            visited.remove(new_state)
+        return min_cost if min_cost != float('inf') else None
+
+
+def scrambled(cube_class, solved, depth, rng):
+    moves = list(cube_class.MOVE_TABLE)
+    cube = cube_class(solved)
+    return str(cube.apply_sequence(cube.state, [rng.choice(moves) for _ in range(depth)]))
+
+
+def run(cube_class, solved, max_depth, seed):
+    # A deep scramble is never solved within max_depth, so both searches exhaust the tree
+    state = scrambled(cube_class, solved, 20, random.Random(seed))
+    results = {}
+    for name, search in (("list", ListStateSearch(cube_class(state))), ("bytes", BytesStateSearch(cube_class(state)))):
+        start = time.perf_counter()
+        search.solve_phase1(max_depth=max_depth)
+        elapsed = time.perf_counter() - start
+        results[name] = search.nodes / elapsed
+        print(f"{cube_class.__name__:8} {name:6} {search.nodes:8d} nodes  {search.nodes / elapsed:10.0f} nodes/sec")
+    print(f"{cube_class.__name__:8} speedup {results['bytes'] / results['list']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(Cube3x3, "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB", args.depth, args.seed)
+    run(Cube2x2, "UUUURRRRFFFFDDDDLLLLBBBB", args.depth, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Shared fixtures and helpers for the backend tests.
+
+Run from backend/: python -m pytest -q
+"""
+
+import os
+
+os.environ.setdefault("SOLVER_WORKERS", "1")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from reduction import solved_state
+from solver_pool import CUBE_CLASSES, shutdown_pool
+
+COLOR_NAMES = {face: color for color, face in main.COLOR_MAPPING.items()}
+
+
+@pytest.fixture(scope="session")
+def client():
+    # The startup hook is skipped, so the pool starts on the first solve instead of warming every worker
+    yield TestClient(main.app)
+    shutdown_pool()
+
+
+def scramble(size, seed, depth=25):
+    states, _ = CUBE_CLASSES[size].random_states(solved_state(size), 1, depth, seed)
+    return states[0].tobytes().decode("ascii")
+
+
+def faces_of(state, size):
+    """A state string as the faces of a /solve-cube request"""
+    stickers = size * size
+    return {face: [COLOR_NAMES[c] for c in state[i * stickers:(i + 1) * stickers]]
+            for i, face in enumerate("URFDLB")}
+
+
+def solve(client, state, size, **options):
+    return client.post("/solve-cube", json={"faces": faces_of(state, size), "size": size, **options})
+
+
+def swapped(state, *cycles):
+    """state with the sticker colors in each cycle of indices moved one step along it"""
+    stickers = list(state)
+    for cycle in cycles:
+        colors = [stickers[i] for i in cycle]
+        for i, color in zip(cycle[1:] + cycle[:1], colors):
+            stickers[i] = color
+    return ''.join(stickers)
+
+
+def assert_solves(state, size, moves):
+    cube = CUBE_CLASSES[size](state)
+    end = str(cube.apply_sequence(cube.state, moves.split()))
+    # Even cubes may end up solved in another orientation than the one scrambled from
+    assert cube.normalize_colors(end) == cube.solved_state
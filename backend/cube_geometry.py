@@ -0,0 +1,208 @@
+"""Facelet geometry of an NxN cube: move permutations and the 48 symmetries.
+
+Facelets are numbered like the Kociemba string: faces in URFDLB order, each
+face row by row as seen when looking straight at it. Coordinates are doubled
+so that every sticker centre is an integer point: x runs L to R, y D to U
+and z B to F, with the face planes at +-N.
+
+Moves use WCA notation: outer turns (R), inner slices (2R), wide turns (Rw,
+3Rw, and r for two layers), middle slices on odd cubes (M E S) and whole
+cube rotations (x y z), each with a 2 or ' suffix.
+"""
+
+import re
+from itertools import permutations, product
+
+import numpy as np
+
+FACES = "URFDLB"
+
+# normal, direction of increasing row, direction of increasing column
+FACE_AXES = {
+    'U': ((0, 1, 0), (0, 0, 1), (1, 0, 0)),
+    'R': ((1, 0, 0), (0, -1, 0), (0, 0, -1)),
+    'F': ((0, 0, 1), (0, -1, 0), (1, 0, 0)),
+    'D': ((0, -1, 0), (0, 0, -1), (1, 0, 0)),
+    'L': ((-1, 0, 0), (0, -1, 0), (0, 0, 1)),
+    'B': ((0, 0, -1), (0, -1, 0), (-1, 0, 0)),
+}
+NORMAL_FACE = {axes[0]: face for face, axes in FACE_AXES.items()}
+
+
+def facelet_positions(n):
+    """Doubled 3D position of every facelet of an n x n cube, in string order"""
+    positions = []
+    for face in FACES:
+        normal, row_dir, col_dir = FACE_AXES[face]
+        for row in range(n):
+            for col in range(n):
+                r, c = 2 * row - (n - 1), 2 * col - (n - 1)
+                positions.append(tuple(
+                    n * normal[k] + r * row_dir[k] + c * col_dir[k] for k in range(3)))
+    return positions
+
+
+MOVE_SUFFIXES = ("", "2", "'")
+# Middle slices turn like the face given, whole-cube rotations like the face they are named after
+SLICE_FACES = {'M': 'L', 'E': 'D', 'S': 'F'}
+ROTATION_FACES = {'x': 'R', 'y': 'U', 'z': 'F'}
+_MOVE_PATTERN = re.compile(r"(\d*)([URFDLBurfdlbMESxyz])(w?)(['2]?)$")
+
+
+def parse_move(n, move):
+    """(face, turned layers counted from that face starting at 1, clockwise quarter turns) of a move"""
+    match = _MOVE_PATTERN.match(move)
+    if match is None:
+        raise ValueError(f"Unknown move {move!r}")
+    depth, face, wide, suffix = match.groups()
+    turns = {"": 1, "2": 2, "'": 3}[suffix]
+    if face in ROTATION_FACES or face in SLICE_FACES or face.islower():
+        if depth or wide or (face in SLICE_FACES and n % 2 == 0):
+            raise ValueError(f"Unknown move {move!r} on a {n}x{n} cube")
+        if face in ROTATION_FACES:
+            return ROTATION_FACES[face], range(1, n + 1), turns
+        if face in SLICE_FACES:
+            return SLICE_FACES[face], range((n + 1) // 2, (n + 1) // 2 + 1), turns
+        return face.upper(), range(1, 3), turns
+    if wide:
+        layers = range(1, int(depth or 2) + 1)
+    else:
+        layers = range(int(depth or 1), int(depth or 1) + 1)
+    if not 1 <= layers[0] <= layers[-1] <= n:
+        raise ValueError(f"Unknown move {move!r} on a {n}x{n} cube")
+    return face, layers, turns
+
+
+def _quarter_turn(axis, p):
+    """Clockwise quarter turn about axis, seen from the face it points to: p -> a(a.p) - a x p"""
+    dot = sum(a * v for a, v in zip(axis, p))
+    cross = (axis[1] * p[2] - axis[2] * p[1], axis[2] * p[0] - axis[0] * p[2],
+             axis[0] * p[1] - axis[1] * p[0])
+    return tuple(dot * a - c for a, c in zip(axis, cross))
+
+
+def _layer(n, axis, p):
+    """Layer of the facelet at p counted from the face axis points to, starting at 1"""
+    height = sum(a * v for a, v in zip(axis, p))
+    # Facelets on the face planes belong to the outermost cubie layers
+    if abs(height) == n:
+        height -= 1 if height > 0 else -1
+    return (n + 1 - height) // 2
+
+
+def _layer_turns(n):
+    """{(face, layer): facelet permutation of one clockwise quarter turn of that layer}"""
+    positions = facelet_positions(n)
+    index = {p: i for i, p in enumerate(positions)}
+    turns = {}
+    for face in FACES:
+        axis = FACE_AXES[face][0]
+        for layer in range(1, n + 1):
+            perm = np.arange(len(positions))
+            for i, p in enumerate(positions):
+                if _layer(n, axis, p) == layer:
+                    perm[index[_quarter_turn(axis, p)]] = i
+            turns[face, layer] = perm
+    return turns
+
+
+def move_permutation(n, move, layer_turns=None):
+    """Facelet permutation of a move on an n x n cube: new_state[i] = state[perm[i]]"""
+    face, layers, turns = parse_move(n, move)
+    layer_turns = layer_turns or _layer_turns(n)
+    perm = np.arange(6 * n * n)
+    for layer in layers:
+        for _ in range(turns):
+            perm = perm[layer_turns[face, layer]]
+    return perm
+
+
+def move_names(n):
+    """Every move with a table for an n x n cube, outer face turns first in URFDLB order"""
+    bases = list(FACES)
+    if n >= 3:
+        bases += [face.lower() for face in FACES] + [face + "w" for face in FACES]
+        bases += list(SLICE_FACES) if n % 2 else []
+        bases += list(ROTATION_FACES)
+    for depth in range(2, n):
+        bases += [f"{depth}{face}" for face in FACES]
+        if depth > 2:
+            bases += [f"{depth}{face}w" for face in FACES]
+    return [base + suffix for base in bases for suffix in MOVE_SUFFIXES]
+
+
+def move_table(n):
+    """{move: permutation index array} for every move of an n x n cube"""
+    layer_turns = _layer_turns(n)
+    return {move: move_permutation(n, move, layer_turns) for move in move_names(n)}
+
+
+# Cubes the solvers handle, with their move tables built once at import
+CUBE_SIZES = (2, 3, 4, 5)
+MOVE_TABLES = {n: move_table(n) for n in CUBE_SIZES}
+
+
+def _transform(matrix, vector):
+    return tuple(sum(matrix[i][k] * vector[k] for k in range(3)) for i in range(3))
+
+
+def _determinant(m):
+    return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+            - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+            + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+
+def _symmetry_matrices():
+    """All 48 signed permutation matrices, identity first"""
+    matrices = []
+    for axes in permutations(range(3)):
+        for signs in product((1, -1), repeat=3):
+            matrices.append(tuple(
+                tuple(signs[i] if k == axes[i] else 0 for k in range(3)) for i in range(3)))
+    return matrices
+
+
+SYMMETRY_MATRICES = _symmetry_matrices()
+
+
+class Symmetry:
+    """A rotation or reflection of the cube acting on facelets, face labels and moves"""
+
+    def __init__(self, matrix, n):
+        self.matrix = matrix
+        self.mirror = _determinant(matrix) < 0
+        self.face_map = {face: NORMAL_FACE[_transform(matrix, FACE_AXES[face][0])]
+                         for face in FACES}
+        self.inverse_face_map = {v: k for k, v in self.face_map.items()}
+        positions = facelet_positions(n)
+        index = {p: i for i, p in enumerate(positions)}
+        # Facelet i is carried to facelet target[i]
+        self.target = [index[_transform(matrix, p)] for p in positions]
+
+    def apply(self, state):
+        """Conjugate a facelet string: move every sticker and rename its color alike"""
+        result = [None] * len(state)
+        for i, color in enumerate(state):
+            result[self.target[i]] = self.face_map.get(color, color)
+        return ''.join(result)
+
+    def map_move(self, move, inverse=False):
+        face_map = self.inverse_face_map if inverse else self.face_map
+        depth, face, wide, suffix = _MOVE_PATTERN.match(move).groups()
+        mapped = face_map[face.upper()]
+        if self.mirror:
+            suffix = {'': "'", "'": ''}.get(suffix, suffix)
+        return depth + (mapped.lower() if face.islower() else mapped) + wide + suffix
+
+    def map_moves(self, moves, inverse=False):
+        return [self.map_move(move, inverse) for move in moves]
+
+
+_SYMMETRIES = {}
+
+
+def symmetries(n):
+    """The 48 cube symmetries for an n x n cube, identity first"""
+    if n not in _SYMMETRIES:
+        _SYMMETRIES[n] = [Symmetry(matrix, n) for matrix in SYMMETRY_MATRICES]
+    return _SYMMETRIES[n]
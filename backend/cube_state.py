@@ -0,0 +1,112 @@
+"""Compact sticker-level cube state.
+
+A state is the facelet string stored as bytes. Moves are precompiled NumPy
+index arrays applied with one gather, and the bytes double as the hash key,
+so search nodes never build Python lists or join strings.
+"""
+
+import numpy as np
+
+
+def compile_moves(move_table):
+    """Turn a {move: permutation list} table into {move: index array}"""
+    return {move: np.array(perm, dtype=np.intp) for move, perm in move_table.items()}
+
+
+def permute(data, perm):
+    """Apply a compiled move to raw state bytes"""
+    return np.frombuffer(data, dtype=np.uint8)[perm].tobytes()
+
+
+class CubeState:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        if isinstance(data, CubeState):
+            data = data.data
+        elif isinstance(data, str):
+            data = data.encode("ascii")
+        elif not isinstance(data, bytes):
+            data = ''.join(data).encode("ascii")
+        self.data = data
+
+    def apply(self, perm):
+        return CubeState(permute(self.data, perm))
+
+    def __str__(self):
+        return self.data.decode("ascii")
+
+    def __repr__(self):
+        return f"CubeState({str(self)!r})"
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return str(self)[index]
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __eq__(self, other):
+        if isinstance(other, CubeState):
+            return self.data == other.data
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.data)
+
+
+# Batched states: an (n, stickers) uint8 array with one state per row
+
+def encode_states(states):
+    """Pack facelet strings (or CubeStates) into an (n, stickers) uint8 array"""
+    data = b''.join(CubeState(state).data for state in states)
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(states), -1).copy()
+
+
+def decode_states(array):
+    return [row.tobytes().decode("ascii") for row in array]
+
+
+def stack_moves(compiled_moves):
+    """Move names and an (m, stickers) array of their permutations"""
+    names = list(compiled_moves)
+    return names, np.stack([compiled_moves[name] for name in names])
+
+
+def apply_move_batch(states, perm):
+    """Apply one move to every row"""
+    return states[:, perm]
+
+
+def apply_moves_batch(states, perms):
+    """Apply a different move to each row; perms has one permutation per row"""
+    return np.take_along_axis(states, perms, axis=1)
+
+
+def expand_frontier(states, move_stack):
+    """All children of every state: row i * m + j is state i after move j"""
+    return states[:, move_stack].reshape(-1, states.shape[1])
+
+
+def _row_keys(states):
+    return np.ascontiguousarray(states).view(np.dtype((np.void, states.shape[1]))).ravel()
+
+
+def unique_states(states):
+    return states[np.unique(_row_keys(states), return_index=True)[1]]
+
+
+def bfs_layers(start, move_stack, depth):
+    """States at each distance 0..depth from start, one array per layer"""
+    layers = [unique_states(start)]
+    seen = _row_keys(layers[0])
+    for _ in range(depth):
+        children = unique_states(expand_frontier(layers[-1], move_stack))
+        new = children[~np.isin(_row_keys(children), seen)]
+        layers.append(new)
+        seen = np.concatenate([seen, _row_keys(new)])
+    return layers
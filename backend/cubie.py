@@ -0,0 +1,275 @@
+"""Cubie-level 3x3 model and the integer coordinates used by the two-phase solver."""
+
+FACES = "URFDLB"
+
+# Corner and edge positions in Kociemba order
+URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB = range(8)
+UR, UF, UL, UB, DR, DF, DL, DB, FR, FL, BL, BR = range(12)
+
+# Facelet indices (into the 54-char U,R,F,D,L,B string) of every corner/edge position
+CORNER_FACELETS = [
+    [8, 9, 20], [6, 18, 38], [0, 36, 47], [2, 45, 11],
+    [29, 26, 15], [27, 44, 24], [33, 53, 42], [35, 17, 51]
+]
+EDGE_FACELETS = [
+    [5, 10], [7, 19], [3, 37], [1, 46], [32, 16], [28, 25],
+    [30, 43], [34, 52], [23, 12], [21, 41], [50, 39], [48, 14]
+]
+
+OPPOSITE_FACES = {'U': 'D', 'D': 'U', 'R': 'L', 'L': 'R', 'F': 'B', 'B': 'F'}
+
+CORNER_COLORS = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+EDGE_COLORS = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+
+# Moves are numbered face * 3 + power, power 0 = quarter turn, 1 = half turn, 2 = inverse
+MOVE_NAMES = [face + suffix for face in FACES for suffix in ("", "2", "'")]
+MOVE_INDEX = {name: i for i, name in enumerate(MOVE_NAMES)}
+
+N_TWIST = 2187
+N_FLIP = 2048
+N_SLICE = 495
+N_CORNERS = 40320
+N_UD_EDGES = 40320
+N_SLICE_SORTED = 24
+
+_FACTORIAL = [1, 1, 2, 6, 24, 120, 720, 5040, 40320]
+
+
+class InvalidCubeError(ValueError):
+    """A sticker pattern that is not a cube reachable by face turns"""
+
+
+# Stickers read in facelet order -> (piece, orientation)
+_CORNER_LOOKUP = {
+    ''.join(colors[(n - ori) % 3] for n in range(3)): (j, ori)
+    for j, colors in enumerate(CORNER_COLORS) for ori in range(3)
+}
+_EDGE_LOOKUP = {
+    ''.join(colors[(n - ori) % 2] for n in range(2)): (j, ori)
+    for j, colors in enumerate(EDGE_COLORS) for ori in range(2)
+}
+
+
+def relabel_from_dbl(state, d, b, l):
+    """Relabel the colors of a facelet string so the corner at DBL, showing colors d, b and l on
+    its D, B and L stickers, is solved; for cubes without fixed centers"""
+    relabel = {d: 'D', b: 'B', l: 'L'}
+    relabel.update({OPPOSITE_FACES.get(d): 'U', OPPOSITE_FACES.get(b): 'F', OPPOSITE_FACES.get(l): 'R'})
+    if len(relabel) != 6 or None in relabel:
+        raise InvalidCubeError(f"Corner at DBL has stickers {d}{b}{l}, which is not a corner piece")
+    return ''.join(relabel[c] for c in state)
+
+
+def _check_unique(pieces, names, kind):
+    seen = {}
+    for position, piece in enumerate(pieces):
+        if piece in seen:
+            raise InvalidCubeError(
+                f"{kind} {names[piece]} appears at both {names[seen[piece]]} and {names[position]}")
+        seen[piece] = position
+
+
+def _binomial(n, k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+def permutation_rank(perm):
+    """Lexicographic rank of a permutation of 0..n-1"""
+    n = len(perm)
+    rank = 0
+    for i in range(n):
+        smaller = 0
+        for j in range(i + 1, n):
+            if perm[j] < perm[i]:
+                smaller += 1
+        rank += smaller * _FACTORIAL[n - 1 - i]
+    return rank
+
+
+def permutation_unrank(rank, n):
+    items = list(range(n))
+    perm = []
+    for i in range(n - 1, -1, -1):
+        index, rank = divmod(rank, _FACTORIAL[i])
+        perm.append(items.pop(index))
+    return perm
+
+
+class CubieCube:
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        self.cp = list(cp) if cp is not None else list(range(8))
+        self.co = list(co) if co is not None else [0] * 8
+        self.ep = list(ep) if ep is not None else list(range(12))
+        self.eo = list(eo) if eo is not None else [0] * 12
+
+    def __eq__(self, other):
+        return (self.cp == other.cp and self.co == other.co
+                and self.ep == other.ep and self.eo == other.eo)
+
+    def copy(self):
+        return CubieCube(self.cp, self.co, self.ep, self.eo)
+
+    @classmethod
+    def from_facelets(cls, state):
+        """Build a cubie cube from a 54-char facelet string labelled by face (URFDLB)"""
+        cube = cls()
+        for i, facelets in enumerate(CORNER_FACELETS):
+            stickers = ''.join(state[f] for f in facelets)
+            if stickers not in _CORNER_LOOKUP:
+                raise InvalidCubeError(
+                    f"Corner at {CORNER_COLORS[i]} has stickers {stickers}, which is not a corner piece")
+            cube.cp[i], cube.co[i] = _CORNER_LOOKUP[stickers]
+
+        for i, facelets in enumerate(EDGE_FACELETS):
+            stickers = ''.join(state[f] for f in facelets)
+            if stickers not in _EDGE_LOOKUP:
+                raise InvalidCubeError(
+                    f"Edge at {EDGE_COLORS[i]} has stickers {stickers}, which is not an edge piece")
+            cube.ep[i], cube.eo[i] = _EDGE_LOOKUP[stickers]
+
+        _check_unique(cube.cp, CORNER_COLORS, "Corner")
+        _check_unique(cube.ep, EDGE_COLORS, "Edge")
+        return cube
+
+    def verify(self):
+        """Raise InvalidCubeError unless the cube is reachable by face turns"""
+        if sum(self.co) % 3:
+            raise InvalidCubeError(
+                f"Corner twist is off by {sum(self.co) % 3} (a corner has been twisted in place)")
+        if sum(self.eo) % 2:
+            raise InvalidCubeError("Edge flip parity is odd (an edge has been flipped in place)")
+        if self.corner_parity() != self.edge_parity():
+            raise InvalidCubeError(
+                "Corner and edge permutation parities differ (two pieces have been swapped)")
+
+    def to_facelets(self):
+        state = [FACES[i // 9] for i in range(54)]
+        for i in range(8):
+            j, ori = self.cp[i], self.co[i]
+            for n in range(3):
+                state[CORNER_FACELETS[i][(n + ori) % 3]] = CORNER_COLORS[j][n]
+        for i in range(12):
+            j, ori = self.ep[i], self.eo[i]
+            for n in range(2):
+                state[EDGE_FACELETS[i][(n + ori) % 2]] = EDGE_COLORS[j][n]
+        return ''.join(state)
+
+    def multiply(self, other):
+        """Return self * other, i.e. this cube followed by the move/cube other"""
+        cp = [self.cp[other.cp[i]] for i in range(8)]
+        co = [(self.co[other.cp[i]] + other.co[i]) % 3 for i in range(8)]
+        ep = [self.ep[other.ep[i]] for i in range(12)]
+        eo = [(self.eo[other.ep[i]] + other.eo[i]) % 2 for i in range(12)]
+        return CubieCube(cp, co, ep, eo)
+
+    def apply_move(self, move):
+        if isinstance(move, str):
+            move = MOVE_INDEX[move]
+        return self.multiply(MOVE_CUBES[move])
+
+    def apply_sequence(self, moves):
+        cube = self
+        for move in moves:
+            cube = cube.apply_move(move)
+        return cube
+
+    # Phase 1 coordinates
+
+    def get_twist(self):
+        twist = 0
+        for i in range(7):
+            twist = 3 * twist + self.co[i]
+        return twist
+
+    def get_flip(self):
+        flip = 0
+        for i in range(11):
+            flip = 2 * flip + self.eo[i]
+        return flip
+
+    def get_slice(self):
+        """Position of the four UD-slice edges, ignoring their order; 0 when in the slice"""
+        s, x = 0, 0
+        for j in range(BR, UR - 1, -1):
+            if self.ep[j] >= FR:
+                s += _binomial(11 - j, x + 1)
+                x += 1
+        return s
+
+    # Phase 2 coordinates, only meaningful once the cube is in <U,D,R2,L2,F2,B2>
+
+    def get_corners(self):
+        return permutation_rank(self.cp)
+
+    def get_ud_edges(self):
+        return permutation_rank(self.ep[:8])
+
+    def get_slice_sorted(self):
+        return permutation_rank([e - FR for e in self.ep[8:]])
+
+    def corner_parity(self):
+        s = 0
+        for i in range(7, 0, -1):
+            for j in range(i - 1, -1, -1):
+                if self.cp[j] > self.cp[i]:
+                    s += 1
+        return s % 2
+
+    def edge_parity(self):
+        s = 0
+        for i in range(11, 0, -1):
+            for j in range(i - 1, -1, -1):
+                if self.ep[j] > self.ep[i]:
+                    s += 1
+        return s % 2
+
+
+# Quarter turns of the six faces in cubie representation
+BASIC_MOVES = {
+    'U': CubieCube([UBR, URF, UFL, ULB, DFR, DLF, DBL, DRB], [0] * 8,
+                   [UB, UR, UF, UL, DR, DF, DL, DB, FR, FL, BL, BR], [0] * 12),
+    'R': CubieCube([DFR, UFL, ULB, URF, DRB, DLF, DBL, UBR], [2, 0, 0, 1, 1, 0, 0, 2],
+                   [FR, UF, UL, UB, BR, DF, DL, DB, DR, FL, BL, UR], [0] * 12),
+    'F': CubieCube([UFL, DLF, ULB, UBR, URF, DFR, DBL, DRB], [1, 2, 0, 0, 2, 1, 0, 0],
+                   [UR, FL, UL, UB, DR, FR, DL, DB, UF, DF, BL, BR],
+                   [0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0, 0]),
+    'D': CubieCube([URF, UFL, ULB, UBR, DLF, DBL, DRB, DFR], [0] * 8,
+                   [UR, UF, UL, UB, DF, DL, DB, DR, FR, FL, BL, BR], [0] * 12),
+    'L': CubieCube([URF, ULB, DBL, UBR, DFR, UFL, DLF, DRB], [0, 1, 2, 0, 0, 2, 1, 0],
+                   [UR, UF, BL, UB, DR, DF, FL, DB, FR, UL, DL, BR], [0] * 12),
+    'B': CubieCube([URF, UFL, UBR, DRB, DFR, DLF, ULB, DBL], [0, 0, 1, 2, 0, 0, 2, 1],
+                   [UR, UF, UL, BR, DR, DF, DL, BL, FR, FL, UB, DB],
+                   [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1]),
+}
+
+
+def _build_move_cubes():
+    cubes = []
+    for face in FACES:
+        quarter = BASIC_MOVES[face]
+        half = quarter.multiply(quarter)
+        cubes.extend([quarter, half, half.multiply(quarter)])
+    return cubes
+
+
+MOVE_CUBES = _build_move_cubes()
+
+
+def facelet_permutation(move):
+    """Sticker permutation of a move: new_state[i] = state[perm[i]]"""
+    cube = MOVE_CUBES[MOVE_INDEX[move]]
+    perm = list(range(54))
+    for i in range(8):
+        j, ori = cube.cp[i], cube.co[i]
+        for n in range(3):
+            perm[CORNER_FACELETS[i][(n + ori) % 3]] = CORNER_FACELETS[j][n]
+    for i in range(12):
+        j, ori = cube.ep[i], cube.eo[i]
+        for n in range(2):
+            perm[EDGE_FACELETS[i][(n + ori) % 2]] = EDGE_FACELETS[j][n]
+    return perm
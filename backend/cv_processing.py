@@ -1,6 +1,13 @@
-import cv2
+"""Face photos to sticker colors.
+
+OpenCV, SciPy and scikit-learn take most of a second to import, so each
+function imports what it needs; workers that only solve never load them.
+"""
+
+import time
+from functools import cache
+
 import numpy as np
-from sklearn.cluster import KMeans
 
 COLOR_MAP = {
     'white': [255, 255, 255],
@@ -11,25 +18,70 @@ COLOR_MAP = {
     'orange': [255, 165, 0]
 }
 
-# HSV color ranges for better color detection
-COLOR_HSV_RANGES = {
-    'white': ([0, 0, 200], [180, 30, 255]),
-    'yellow': ([20, 100, 100], [30, 255, 255]),
-    'green': ([35, 100, 100], [85, 255, 255]),
-    'blue': ([100, 100, 100], [130, 255, 255]),
-    'red': ([0, 100, 100], [10, 255, 255]),  # Lower red
-    'orange': ([10, 100, 100], [20, 255, 255])
-}
+COLOR_NAMES = list(COLOR_MAP)
+
+# Fraction of each cell trimmed from every side before taking the median
+CELL_CROP = 0.2
 
-def process_face_image(image_path):
-    img = cv2.imread(image_path)
+def hsv_features(hsv):
+    """Map OpenCV HSV (H in 0..179) onto a cylinder so red hues near 0 and 179 stay close"""
+    hsv = np.asarray(hsv, dtype=np.float32)
+    angle = hsv[..., 0] * (np.pi / 90)
+    saturation = hsv[..., 1] / 255
+    return np.stack([saturation * np.cos(angle), saturation * np.sin(angle), hsv[..., 2] / 255], axis=-1)
+
+@cache
+def default_centroids():
+    """One row per color in COLOR_NAMES, in hsv_features space"""
+    import cv2
+    rgb = np.array([COLOR_MAP[name] for name in COLOR_NAMES], dtype=np.uint8).reshape(1, -1, 3)
+    return hsv_features(cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)[0])
+
+def decode_image(data):
+    """Decode encoded image bytes (JPEG, PNG, ...) to a BGR array without touching disk"""
+    import cv2
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
     if img is None:
-        raise ValueError(f"Could not read image at {image_path}")
-        
+        raise ValueError("Could not decode image data")
+    return img
+
+def order_corners(box):
+    """Corners as top-left, top-right, bottom-right, bottom-left, whatever order minAreaRect used"""
+    sums = box.sum(axis=1)
+    diffs = box[:, 1] - box[:, 0]
+    return np.array([box[np.argmin(sums)], box[np.argmin(diffs)],
+                     box[np.argmax(sums)], box[np.argmax(diffs)]])
+
+def process_face_image(image, max_dim=None, timings=None):
+    """Warp the face in an image to 300x300 and cut it into 9 cells.
+
+    image may be encoded bytes, a BGR array or a file path. With max_dim the
+    contour search runs on a copy downscaled to at most max_dim pixels per
+    side; the warp still samples the full-resolution image. A timings dict,
+    if given, receives the seconds spent in decode, contour and warp.
+    """
+    import cv2
+    start = time.perf_counter()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        img = decode_image(image)
+    elif isinstance(image, np.ndarray):
+        img = image
+    else:
+        img = cv2.imread(image)
+        if img is None:
+            raise ValueError(f"Could not read image at {image}")
+
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    decoded = time.perf_counter()
+
+    scale = 1.0
+    small = img
+    if max_dim and max(img.shape[:2]) > max_dim:
+        scale = max_dim / max(img.shape[:2])
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
     # Preprocessing
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
     _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
@@ -39,13 +91,15 @@ def process_face_image(image_path):
 
     largest_contour = max(contours, key=cv2.contourArea)
     rect = cv2.minAreaRect(largest_contour)
-    box = cv2.boxPoints(rect)
+    box = order_corners(cv2.boxPoints(rect) / scale)
     box = box.astype(np.int32)
 
+    contoured = time.perf_counter()
+
     # Perspective correction
     width, height = 300, 300
     src_pts = box.astype("float32")
-    dst_pts = np.array([[0, height - 1], [0, 0], [width - 1, 0], [width - 1, height - 1]], dtype="float32")
+    dst_pts = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype="float32")
     matrix = cv2.getPerspectiveTransform(src_pts, dst_pts)
     warped = cv2.warpPerspective(img, matrix, (width, height))
 
@@ -57,39 +111,72 @@ def process_face_image(image_path):
             cell = warped[i*cell_size:(i+1)*cell_size, j*cell_size:(j+1)*cell_size]
             grid.append(cell)
 
+    if timings is not None:
+        timings["decode"] = decoded - start
+        timings["contour"] = contoured - decoded
+        timings["warp"] = time.perf_counter() - contoured
     return grid, warped
 
-def recognize_colors(grid_images):
-    recognized = []
-    for cell in grid_images:
-        # Convert to HSV for better color detection
-        cell_hsv = cv2.cvtColor(cell, cv2.COLOR_RGB2HSV)
-        
-        # Get dominant color using both RGB and HSV methods
-        avg_color_rgb = np.mean(cell, axis=(0, 1))
-        avg_color_hsv = np.mean(cell_hsv, axis=(0, 1))
-        
-        min_dist = float('inf')
-        color_name = 'unknown'
-        confidence = 0
-
-        # Try HSV-based detection first (more reliable)
-        for name, (lower, upper) in COLOR_HSV_RANGES.items():
-            if (lower[0] <= avg_color_hsv[0] <= upper[0] and
-                lower[1] <= avg_color_hsv[1] <= upper[1] and
-                lower[2] <= avg_color_hsv[2] <= upper[2]):
-                color_name = name
-                confidence = 1.0
-                break
-        
-        # Fallback to RGB distance if HSV didn't work
-        if confidence == 0:
-            for name, rgb in COLOR_MAP.items():
-                dist = np.linalg.norm(avg_color_rgb - rgb)
-                if dist < min_dist:
-                    min_dist = dist
-                    color_name = name
-
-        recognized.append(color_name)
-
-    return recognized
+# cv2.imencode extension and (flag name, value) parameter for each supported output format
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', ('IMWRITE_JPEG_QUALITY', 85)),
+    'png': ('.png', ('IMWRITE_PNG_COMPRESSION', 3)),
+    'webp': ('.webp', ('IMWRITE_WEBP_QUALITY', 80)),
+}
+
+def encode_image(img, image_format='jpeg', max_dim=None):
+    """Encode an RGB image as JPEG/PNG/WebP bytes, optionally shrunk to at most max_dim per side"""
+    import cv2
+    if max_dim and max(img.shape[:2]) > max_dim:
+        scale = max_dim / max(img.shape[:2])
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    extension, (flag, value) = IMAGE_FORMATS[image_format]
+    ok, encoded = cv2.imencode(extension, cv2.cvtColor(img, cv2.COLOR_RGB2BGR), [getattr(cv2, flag), value])
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return encoded.tobytes()
+
+def face_medians(face, crop=CELL_CROP):
+    """Per-sticker HSV medians of a warped RGB face as a (9, 3) array, borders cropped away"""
+    import cv2
+    hsv = cv2.cvtColor(face, cv2.COLOR_RGB2HSV)
+    ch, cw = hsv.shape[0] // 3, hsv.shape[1] // 3
+    cells = hsv[:3 * ch, :3 * cw].reshape(3, ch, 3, cw, 3).swapaxes(1, 2)
+    dy, dx = int(ch * crop), int(cw * crop)
+    cells = cells[:, :, dy:ch - dy, dx:cw - dx]
+    return np.median(cells.reshape(9, -1, 3), axis=1)
+
+def classify_medians(medians, centroids=None):
+    """Nearest-centroid color names and confidences (0 = ambiguous, 1 = exact) for (n, 3) HSV medians"""
+    centroids = default_centroids() if centroids is None else centroids
+    dists = np.linalg.norm(hsv_features(medians)[:, None, :] - centroids[None, :, :], axis=2)
+    order = np.argsort(dists, axis=1)
+    rows = np.arange(len(dists))
+    best, second = dists[rows, order[:, 0]], dists[rows, order[:, 1]]
+    confidence = 1 - best / np.maximum(second, 1e-9)
+    return [COLOR_NAMES[i] for i in order[:, 0]], confidence
+
+def calibrate(medians_by_face):
+    """Learn the six color centroids from the (9, 3) medians of all six faces.
+
+    Each face center is matched to the reference color it is closest to (one
+    color per face), then k-means over all 54 stickers, seeded with the
+    centers, refines the centroids for the current lighting and camera.
+    """
+    from scipy.optimize import linear_sum_assignment
+    from sklearn.cluster import KMeans
+    default = default_centroids()
+    medians = np.concatenate([np.asarray(m, dtype=np.float32) for m in medians_by_face])
+    centers = hsv_features(np.array([m[4] for m in medians_by_face]))
+    cost = np.linalg.norm(centers[:, None, :] - default[None, :, :], axis=2)
+    faces, colors = linear_sum_assignment(cost)
+    seeds = np.empty_like(default)
+    seeds[colors] = centers[faces]
+    kmeans = KMeans(n_clusters=len(COLOR_NAMES), init=seeds, n_init=1).fit(hsv_features(medians))
+    return kmeans.cluster_centers_.astype(np.float32)
+
+def recognize_colors(grid_images, centroids=None):
+    """Color names of the 9 cells of a face, given as the cell list from process_face_image"""
+    rows = [np.concatenate(grid_images[i:i + 3], axis=1) for i in range(0, 9, 3)]
+    colors, _ = classify_medians(face_medians(np.concatenate(rows, axis=0)), centroids)
+    return colors
@@ -0,0 +1,170 @@
+"""Background solve jobs behind a bounded in-process priority scheduler.
+
+Submitted jobs wait in a priority queue (higher priority first, then in
+submission order) and at most max_running of them run at once. Once
+max_queued jobs are waiting, new submissions are rejected rather than
+queued. Finished jobs are kept for a TTL so clients can poll or stream
+their result, then dropped.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 100))
+MAX_RUNNING_JOBS = int(os.environ.get("MAX_RUNNING_JOBS", 2))
+JOB_TTL = float(os.environ.get("JOB_TTL", 3600))
+# Finished jobs kept at most, oldest dropped first
+MAX_RETAINED_JOBS = int(os.environ.get("MAX_RETAINED_JOBS", 10000))
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit() when max_queued jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, run, priority=0):
+        self.id = uuid.uuid4().hex
+        self.run = run
+        self.priority = priority
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def changed(self):
+        """Event set the next time the job's status or progress changes"""
+        return self._changed
+
+    def update(self, **progress):
+        self.progress.update(progress)
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    def __init__(self, max_queued=MAX_QUEUED_JOBS, max_running=MAX_RUNNING_JOBS, ttl=JOB_TTL,
+                 max_retained=MAX_RETAINED_JOBS):
+        self.max_queued = max_queued
+        self.max_running = max_running
+        self.ttl = ttl
+        self.max_retained = max_retained
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._order = itertools.count()
+        self._runners = []
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the runners; call from inside the event loop"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._runners = [asyncio.ensure_future(self._runner()) for _ in range(self.max_running)]
+
+    async def stop(self):
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._queue, self._runners = None, []
+
+    def submit(self, run, priority=0):
+        """Queue the coroutine function run(job), raising QueueFull if the queue is at capacity.
+
+        The runners start on the first submission if start() was not called;
+        either way this must be called from inside the event loop.
+        """
+        if self._queue is None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                raise RuntimeError("Jobs can only be submitted from inside a running event loop") from None
+            self.start()
+        self._expire()
+        if self.queued() >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull(f"{self.queued()} jobs already queued")
+        job = Job(run, priority)
+        self.jobs[job.id] = job
+        self._queue.put_nowait((-priority, next(self._order), job))
+        self.submitted += 1
+        return job
+
+    def get(self, job_id):
+        self._expire()
+        return self.jobs.get(job_id)
+
+    def queued(self):
+        return 0 if self._queue is None else self._queue.qsize()
+
+    def _expire(self):
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.max_retained)]:
+            del self.jobs[job.id]
+        for job in finished:
+            if job.id in self.jobs and job.finished + self.ttl <= now:
+                del self.jobs[job.id]
+
+    async def _runner(self):
+        while True:
+            _, _, job = await self._queue.get()
+            job.status, job.started = "running", time.time()
+            job._notify()
+            self.running += 1
+            try:
+                job.result = await job.run(job)
+                job.status = "done"
+                self.completed += 1
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                self.failed += 1
+            finally:
+                self.running -= 1
+                job.finished = time.time()
+                job._notify()
+
+    def stats(self):
+        return {
+            "queued": self.queued(),
+            "running": self.running,
+            "retained": len(self.jobs),
+            "max_queued": self.max_queued,
+            "max_running": self.max_running,
+            "ttl": self.ttl,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
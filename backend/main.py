@@ -1,10 +1,29 @@
+import asyncio
+import base64
+import json
 import os
+import time
 import uuid
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Literal, Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from cv_processing import process_face_image, recognize_colors
-from cube_solver import Cube3x3, Cube2x2
-from schemas import SolveRequest
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from cv_processing import (
+    calibrate as calibrate_colors, classify_medians, encode_image, face_medians, process_face_image,
+)
+from cube_geometry import symmetries
+from cubie import InvalidCubeError
+from jobs import JobQueue, QueueFull
+import metrics
+from schemas import JobRequest, SolveRequest
+from solution_cache import SolutionCache
+from solver_pool import (
+    CUBE_CLASSES, PARALLEL_SPLIT_DEPTH, get_pool, make_cube, shutdown_pool, solve_state, solve_state_parallel,
+    warm_pool,
+)
 
 app = FastAPI()
 
@@ -14,9 +33,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Face", "X-Colors", "X-Confidences"],
 )
 
-os.makedirs("temp_images", exist_ok=True)
+MAX_BATCH_SIZE = 1000
+
+# 'array' is the raw nested list; the others are encoded image bytes
+ImageFormat = Literal['array', 'jpeg', 'png', 'webp']
+
+FACE_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("FACE_WORKERS", 6)))
+
+# Color centroids learned per scanning session, least recently used dropped first
+MAX_CALIBRATIONS = int(os.environ.get("MAX_CALIBRATIONS", 1000))
+CALIBRATIONS = OrderedDict()
+
+# Consecutive identical frames before a streamed face counts as stable
+STABLE_FRAMES = int(os.environ.get("STABLE_FRAMES", 5))
+
+SOLUTION_CACHE = SolutionCache()
+
+# 📬 Long solves can run as background jobs that clients poll or stream
+JOBS = JobQueue()
+# Seconds between repeated events on an idle job stream
+JOB_KEEPALIVE = 15
+
+# 🔥 Startup task that loads the solver tables and warms every worker; /readyz fails until it is done
+WARMUP = None
 
 COLOR_MAPPING = {
     'white': 'U',
@@ -37,74 +79,461 @@ def create_cube_state(scan_data):
             kociemba_string += COLOR_MAPPING[color]
     return kociemba_string
 
+def scan_face(data, max_dim=None, include_image=True, image_format='array', thumbnail=None):
+    timings = {}
+    _, processed_img = process_face_image(data, max_dim, timings)
+    start = time.perf_counter()
+    medians = face_medians(processed_img)
+    timings["medians"] = time.perf_counter() - start
+    for stage, seconds in timings.items():
+        metrics.SCAN_SECONDS.observe(seconds, stage=stage)
+    if not include_image:
+        return None, medians
+    if image_format == 'array':
+        return processed_img, medians
+    return encode_image(processed_img, image_format, thumbnail), medians
+
+def classify_face(medians, centroids=None):
+    start = time.perf_counter()
+    colors, confidences = classify_medians(medians, centroids)
+    metrics.SCAN_SECONDS.observe(time.perf_counter() - start, stage="classify")
+    return colors, confidences
+
+def face_result(face, image, medians, centroids=None, image_format='array'):
+    colors, confidences = classify_face(medians, centroids)
+
+    center = colors[4]
+    if any(colors[i] == center for i in [0, 1, 2, 3, 5, 6, 7, 8]):
+        raise HTTPException(400, f"Center color of face {face} must be unique and not appear on other tiles")
+
+    result = {
+        "face": face,
+        "colors": colors,
+        "confidences": [round(float(c), 3) for c in confidences],
+        "processed_image": None
+    }
+    # 🗜️ Encoded images travel as base64, the nested list is kept for older clients
+    if isinstance(image, bytes):
+        result["processed_image"] = base64.b64encode(image).decode("ascii")
+        result["image_format"] = image_format
+    elif image is not None:
+        result["processed_image"] = image.tolist()
+    return result
+
+async def run_scan_face(face, data, *args, profile=False):
+    # 🧵 OpenCV releases the GIL, so faces are processed on worker threads
+    loop = asyncio.get_running_loop()
+    try:
+        if profile:
+            return await loop.run_in_executor(FACE_POOL, partial(metrics.profile_call, scan_face, data, *args))
+        return await loop.run_in_executor(FACE_POOL, scan_face, data, *args)
+    except Exception as e:
+        raise HTTPException(500, f"Processing error on face {face}: {str(e)}")
+
+def session_centroids(session):
+    if session is None:
+        return None
+    if session not in CALIBRATIONS:
+        raise HTTPException(404, f"Unknown calibration session '{session}'")
+    CALIBRATIONS.move_to_end(session)
+    return CALIBRATIONS[session]
+
+def store_calibration(centroids):
+    session = uuid.uuid4().hex
+    CALIBRATIONS[session] = centroids
+    while len(CALIBRATIONS) > MAX_CALIBRATIONS:
+        CALIBRATIONS.popitem(last=False)
+    return session
+
 @app.post("/process-face")
-async def process_face(face: str = Form(...), file: UploadFile = File(...)):
+async def process_face(face: str = Form(...), file: UploadFile = File(...),
+                       max_dim: Optional[int] = None, session: Optional[str] = None,
+                       include_image: bool = True, image_format: ImageFormat = 'array',
+                       thumbnail: Optional[int] = None, binary: bool = False, profile: bool = False):
     if face not in ['U', 'R', 'F', 'D', 'L', 'B']:
         raise HTTPException(400, "Invalid face specified")
+    if binary and (image_format == 'array' or not include_image):
+        raise HTTPException(400, "Binary responses need image_format jpeg, png or webp")
+    centroids = session_centroids(session)
 
-    file_ext = os.path.splitext(file.filename)[1]
-    temp_path = f"temp_images/{uuid.uuid4()}{file_ext}"
+    # 📷 Decode straight from the upload bytes, nothing is written to disk
+    scan = await run_scan_face(
+        face, await file.read(), max_dim, include_image, image_format, thumbnail, profile=profile)
+    if profile:
+        (image, medians), summary = scan
+        return {**face_result(face, image, medians, centroids, image_format), "profile": summary}
+    image, medians = scan
+    if not binary:
+        return face_result(face, image, medians, centroids, image_format)
 
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+    # 📦 Raw image body, with the recognized colors in headers
+    result = face_result(face, None, medians, centroids)
+    return Response(content=image, media_type=f"image/{image_format}", headers={
+        "X-Face": face,
+        "X-Colors": ",".join(result["colors"]),
+        "X-Confidences": ",".join(str(c) for c in result["confidences"])
+    })
 
-    try:
-        grid, processed_img = process_face_image(temp_path)
-        colors = recognize_colors(grid)
+@app.post("/process-faces")
+async def process_faces(U: UploadFile = File(...), R: UploadFile = File(...),
+                        F: UploadFile = File(...), D: UploadFile = File(...),
+                        L: UploadFile = File(...), B: UploadFile = File(...),
+                        max_dim: Optional[int] = None, session: Optional[str] = None,
+                        calibrate: bool = False, include_image: bool = True,
+                        image_format: ImageFormat = 'array', thumbnail: Optional[int] = None):
+    uploads = {'U': U, 'R': R, 'F': F, 'D': D, 'L': L, 'B': B}
+    centroids = session_centroids(session)
+    images = {face: await upload.read() for face, upload in uploads.items()}
+    scans = await asyncio.gather(*(
+        run_scan_face(face, data, max_dim, include_image, image_format, thumbnail)
+        for face, data in images.items()))
 
-        center = colors[4]
-        if any(colors[i] == center for i in [0, 1, 2, 3, 5, 6, 7, 8]):
-            raise HTTPException(400, "Center color must be unique and not appear on other tiles")
+    # 🎨 Six face centers are enough to learn this camera's colors for the session
+    if calibrate:
+        centroids = calibrate_colors([medians for _, medians in scans])
+        session = store_calibration(centroids)
 
-        return {
-            "face": face,
-            "colors": colors,
-            "processed_image": processed_img.tolist() if processed_img is not None else None
-        }
+    faces = {face: face_result(face, image, medians, centroids, image_format)
+             for face, (image, medians) in zip(uploads, scans)}
+    return {"faces": faces, "session": session}
 
-    except Exception as e:
-        raise HTTPException(500, f"Processing error: {str(e)}")
+@app.websocket("/scan-stream")
+async def scan_stream(websocket: WebSocket, face: str = 'U', session: Optional[str] = None,
+                      max_dim: Optional[int] = None, stable_frames: int = STABLE_FRAMES):
+    """Binary messages are encoded frames; a text message {"face": "R"} switches face.
 
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    Only the newest frame is kept while one is being processed, so a slow
+    server drops stale frames instead of falling behind. Every processed frame
+    is answered with its grid, and stable turns true once the same colors have
+    been seen for stable_frames frames in a row.
+    """
+    await websocket.accept()
+    # 🚪 Bad parameters get one error message, then the socket is closed
+    if face not in ['U', 'R', 'F', 'D', 'L', 'B']:
+        await websocket.send_json({"error": "Invalid face specified"})
+        await websocket.close(code=1008)
+        return
+    try:
+        centroids = session_centroids(session)
+    except HTTPException as e:
+        await websocket.send_json({"error": e.detail})
+        await websocket.close(code=1008)
+        return
+    latest = None
+    dropped = 0
+    closed = False
+    frame_ready = asyncio.Event()
 
-@app.post("/solve-cube")
-async def solve_cube(request: SolveRequest):
+    async def receive_frames():
+        nonlocal latest, dropped, closed, face
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    if latest is not None:
+                        dropped += 1
+                        metrics.SCAN_FRAMES_DROPPED.inc()
+                    latest = message["bytes"]
+                    frame_ready.set()
+                elif message.get("text"):
+                    # 💬 A bad control message is answered with an error and the stream goes on
+                    try:
+                        control = json.loads(message["text"])
+                    except json.JSONDecodeError as e:
+                        await websocket.send_json({"error": f"Malformed message: {e}"})
+                        continue
+                    new_face = control.get("face", face) if isinstance(control, dict) else None
+                    if new_face not in ['U', 'R', 'F', 'D', 'L', 'B']:
+                        await websocket.send_json({"error": "Invalid face specified"})
+                        continue
+                    face = new_face
+        finally:
+            closed = True
+            frame_ready.set()
+
+    receiver = asyncio.ensure_future(receive_frames())
+    loop = asyncio.get_running_loop()
+    frames = streak = 0
+    previous = None
     try:
-        cube_size = request.size
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if closed:
+                break
+            data, latest = latest, None
+            frames += 1
+            start_time = time.perf_counter()
+            try:
+                _, medians = await loop.run_in_executor(FACE_POOL, scan_face, data, max_dim, False)
+            except Exception as e:
+                previous, streak = None, 0
+                await websocket.send_json({"frame": frames, "face": face, "error": str(e),
+                                           "dropped": dropped})
+                continue
+            colors, confidences = classify_face(medians, centroids)
+            streak = streak + 1 if colors == previous else 1
+            previous = colors
+            await websocket.send_json({
+                "frame": frames,
+                "face": face,
+                "colors": colors,
+                "confidences": [round(float(c), 3) for c in confidences],
+                "streak": streak,
+                "stable": streak >= stable_frames,
+                "dropped": dropped,
+                "ms": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
 
-        # ✅ Check that all 6 face centers are unique
-        centers = [request.faces[face][4] for face in ['U', 'R', 'F', 'D', 'L', 'B']]
+def prepare_state(request):
+    # ✅ Check that all 6 face centers are unique (even cubes have no fixed centers)
+    if request.size % 2:
+        middle = request.size * request.size // 2
+        centers = [request.faces[face][middle] for face in ['U', 'R', 'F', 'D', 'L', 'B']]
         if len(set(centers)) != 6:
             raise HTTPException(400, "Duplicate center colors found across faces")
 
-        # 🧠 Now it's safe to convert to internal cube state
-        state_str = create_cube_state(request.faces)
+    # 🧠 Now it's safe to convert to internal cube state
+    return create_cube_state(request.faces)
+
+def format_solution(solution, cube=None):
+    # 🎞️ Given the cube the moves start from, every state along the way is included as deltas
+    return {
+        "solution": solution["moves"],
+        "stats": solution["stats"],
+        "state_after_phase1": solution.get("state_after_phase1", ""),
+        "state_after_phase2": solution.get("state_after_phase2", ""),
+        **({"profile": solution["profile"]} if "profile" in solution else {}),
+        **({"trajectory": cube.trajectory(solution["moves"].split())} if cube is not None else {})
+    }
+
+def record_solve(size, solution):
+    stats = solution["stats"]
+    metrics.SOLVE_SECONDS.observe(stats["time"], size=size, phase="total")
+    for phase in ("phase1", "phase2"):
+        if f"{phase}_time" in stats:
+            metrics.SOLVE_SECONDS.observe(stats[f"{phase}_time"], size=size, phase=phase)
+    if "nodes" in stats:
+        metrics.SOLVE_NODES.observe(stats["nodes"], size=size)
+    if "lookups" in stats:
+        metrics.SOLVE_LOOKUPS.observe(stats["lookups"], size=size)
+    for depth, nodes in stats.get("nodes_per_depth", {}).items():
+        metrics.NODES_BY_DEPTH.inc(nodes, size=size, depth=depth)
+    # Only pool solves measure how long they queued
+    if "queue_wait" in solution:
+        metrics.QUEUE_WAIT.observe(solution["queue_wait"])
+
+def validate_and_look_up(cube, use_cache=True):
+    cube.validate()
+    return SOLUTION_CACHE.lookup(cube) if use_cache else None
+
+async def run_solve(state_str, size, max_ms=None, max_moves=None, max_nodes=None, parallel=False,
+                    trajectory=False, profile=False, progress=None):
+    # 🚫 Impossible states are rejected before any search, and ♻️ symmetric or repeated scrambles are
+    # answered from the cache (unless profiling the search); both run on a thread, since validating
+    # and canonicalizing a large cube takes long enough to stall the event loop
+    cube = make_cube(state_str, size)
+    loop = asyncio.get_running_loop()
+    try:
+        cached = await loop.run_in_executor(None, validate_and_look_up, cube, not profile)
+    except InvalidCubeError:
+        metrics.SOLVE_REQUESTS.inc(outcome="invalid")
+        raise
+    if cached is not None and (max_moves is None or cached["stats"]["moves"] <= max_moves):
+        metrics.SOLVE_REQUESTS.inc(outcome="cached")
+        return format_solution(cached, cube if trajectory else None)
+
+    # 🧩 Solve in the process pool so the event loop stays free
+    if (parallel or progress) and size == 3 and not profile:
+        # 🌳 Spread the first moves of the search over every worker, or step depth by depth to report progress
+        solution = await solve_state_parallel(state_str, max_ms, max_moves, max_nodes,
+                                              PARALLEL_SPLIT_DEPTH if parallel else 0, progress)
+    else:
+        solution = await loop.run_in_executor(
+            get_pool(), solve_state, state_str, size, max_ms, max_moves, max_nodes, time.time(), profile)
+    metrics.SOLVE_REQUESTS.inc(outcome="solved")
+    record_solve(size, solution)
+    # ⏱️ Cut-short searches may have missed a shorter solution, so they are not cached
+    if not solution["stats"].get("truncated"):
+        await loop.run_in_executor(None, SOLUTION_CACHE.store, cube, solution)
+    return format_solution(solution, cube if trajectory else None)
+
+def solve_options(request):
+    return {"max_ms": request.max_ms, "max_moves": request.max_moves, "max_nodes": request.max_nodes,
+            "parallel": request.parallel, "trajectory": request.trajectory}
+
+async def warm_up():
+    seconds = await warm_pool()
+    # Solution cache keys are computed in this process, from the symmetries of each size
+    for size in CUBE_CLASSES:
+        symmetries(size)
+    return seconds
 
-        # 🧊 Choose cube class based on size
-        if cube_size == 2:
-            cube = Cube2x2(state_str)
-        else:
-            cube = Cube3x3(state_str)
+def is_ready():
+    return WARMUP is not None and WARMUP.done() and not WARMUP.cancelled() and WARMUP.exception() is None
 
-        # ✅ Validate logical correctness of cube state
-        if not cube.is_valid():
-            raise HTTPException(400, "Invalid cube state")
+@app.on_event("startup")
+async def startup():
+    global WARMUP
+    JOBS.start()
+    # 🌡️ Warm up in the background so /healthz answers while the tables load
+    WARMUP = asyncio.ensure_future(warm_up())
 
-        # 🧩 Solve the cube
-        solution = cube.solve()
+@app.on_event("shutdown")
+async def shutdown():
+    if WARMUP is not None:
+        WARMUP.cancel()
+    await JOBS.stop()
+    shutdown_pool()
+    FACE_POOL.shutdown(wait=False)
+    SOLUTION_CACHE.flush()
 
-        return {
-            "solution": solution["moves"],
-            "stats": solution["stats"],
-            "state_after_phase1": solution.get("state_after_phase1", ""),
-            "state_after_phase2": solution.get("state_after_phase2", "")
-        }
+@app.post("/solve-cube")
+async def solve_cube(request: SolveRequest, profile: bool = False):
+    try:
+        state_str = prepare_state(request)
+        return await run_solve(state_str, request.size, **solve_options(request), profile=profile)
 
+    except HTTPException:
+        raise
+    except InvalidCubeError as e:
+        raise HTTPException(400, f"Invalid cube state: {e}")
+    except TimeoutError as e:
+        raise HTTPException(503, str(e))
     except Exception as e:
+        metrics.SOLVE_REQUESTS.inc(outcome="error")
         raise HTTPException(500, f"Solving error: {str(e)}")
 
+@app.get("/cache-stats")
+async def cache_stats():
+    return SOLUTION_CACHE.stats()
+
+for _stat in ("hits", "disk_hits", "misses", "evictions", "size"):
+    metrics.Gauge(f"cube_solution_cache_{_stat}", f"Solution cache {_stat.replace('_', ' ')}",
+                  lambda stat=_stat: SOLUTION_CACHE.stats()[stat])
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    # 💓 The process is up and its event loop responds, warm or not
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # 🚦 Ready only once every solver worker has loaded its tables and solved a scramble
+    if is_ready():
+        return {"status": "ready", "warmup_seconds": WARMUP.result()}
+    if WARMUP is not None and WARMUP.done() and not WARMUP.cancelled():
+        return JSONResponse({"status": "failed", "error": str(WARMUP.exception())}, status_code=503)
+    return JSONResponse({"status": "warming up"}, status_code=503)
+
+metrics.Gauge("cube_ready", "1 once the solver tables are loaded and the workers warmed up", lambda: int(is_ready()))
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    # 🚫 Bad input fails the submission instead of the job
+    state_str = prepare_state(request)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, make_cube(state_str, request.size).validate)
+    except InvalidCubeError as e:
+        raise HTTPException(400, f"Invalid cube state: {e}")
+
+    async def run(job):
+        return await run_solve(state_str, request.size, **solve_options(request), progress=job.update)
+
+    try:
+        job = JOBS.submit(run, request.priority)
+    except QueueFull as e:
+        raise HTTPException(429, f"Job queue is full: {e}")
+    return {"id": job.id, "status": job.status}
+
+def get_job_or_404(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown or expired job")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = get_job_or_404(job_id)
+
+    async def stream():
+        # 📡 One server-sent event per status or progress change, ending with the result
+        while True:
+            changed = job.changed()
+            yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.done:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), JOB_KEEPALIVE)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/job-stats")
+async def job_stats():
+    return JOBS.stats()
+
+for _stat in ("queued", "running", "retained", "submitted", "rejected", "completed", "failed"):
+    metrics.Gauge(f"cube_jobs_{_stat}", f"Solve jobs {_stat}", lambda stat=_stat: JOBS.stats()[stat])
+
+def parse_batch(body, content_type):
+    try:
+        if content_type.startswith("application/x-ndjson"):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(400, f"Malformed batch body: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(400, "Batch body must be a JSON array or NDJSON of cube states")
+    return items
+
+@app.post("/solve-batch")
+async def solve_batch(request: Request, order: Literal['input', 'completion'] = 'input'):
+    items = parse_batch(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(413, f"At most {MAX_BATCH_SIZE} cube states per batch")
+
+    async def solve_item(index, item):
+        try:
+            solve_request = SolveRequest.model_validate(item)
+            result = await run_solve(prepare_state(solve_request), solve_request.size,
+                                     **solve_options(solve_request))
+            return {"index": index, **result}
+        except HTTPException as e:
+            return {"index": index, "error": e.detail}
+        except InvalidCubeError as e:
+            return {"index": index, "error": f"Invalid cube state: {e}"}
+        except Exception as e:
+            return {"index": index, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(solve_item(i, item)) for i, item in enumerate(items)]
+
+    async def stream():
+        try:
+            for next_result in (tasks if order == 'input' else asyncio.as_completed(tasks)):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # Drop queued solves if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
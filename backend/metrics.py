@@ -0,0 +1,125 @@
+"""In-process counters and histograms rendered in the Prometheus text format."""
+
+import cProfile
+import io
+import pstats
+import threading
+
+# Seconds, from 100 microseconds to a minute
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Counts of nodes, lookups and the like
+COUNT_BUCKETS = tuple(10 ** (i / 2) for i in range(17))
+
+_REGISTRY = []
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._series = {}
+        _REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for labels, value in sorted(self._series.items()):
+                lines.extend(self._render_series(labels, value))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_label_text(labels)} {_number(value)}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_text, buckets=TIME_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def _render_series(self, labels, series):
+        counts, count, total = series
+        lines = [f"{self.name}_bucket{_label_text(labels + (('le', _number(bound)),))} {n}"
+                 for bound, n in zip(self.buckets, counts)]
+        lines.append(f"{self.name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+        lines.append(f"{self.name}_count{_label_text(labels)} {count}")
+        lines.append(f"{self.name}_sum{_label_text(labels)} {_number(total)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time"""
+    type = "gauge"
+
+    def __init__(self, name, help_text, read):
+        super().__init__(name, help_text)
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}",
+                f"{self.name} {_number(self.read())}"]
+
+
+def render():
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def profile_call(fn, *args, limit=25, **kwargs):
+    """Run fn under cProfile; return its result and the top functions by cumulative time"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return result, out.getvalue()
+
+
+# Instruments shared by the API
+
+SOLVE_REQUESTS = Counter("cube_solve_requests_total", "Solve requests by outcome")
+SOLVE_SECONDS = Histogram("cube_solve_seconds", "Solver time per phase")
+SOLVE_NODES = Histogram("cube_solve_nodes", "Search nodes expanded per solve", COUNT_BUCKETS)
+SOLVE_LOOKUPS = Histogram("cube_solve_table_lookups", "Pruning-table lookups per solve", COUNT_BUCKETS)
+NODES_BY_DEPTH = Counter("cube_solve_nodes_by_depth_total", "Nodes expanded per phase 1 search depth")
+QUEUE_WAIT = Histogram("cube_solver_queue_wait_seconds", "Time solves wait for a pool worker")
+SCAN_SECONDS = Histogram("cube_scan_stage_seconds", "Face scan time per stage")
+SCAN_FRAMES_DROPPED = Counter("cube_scan_frames_dropped_total", "Stale stream frames dropped")
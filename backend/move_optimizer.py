@@ -0,0 +1,96 @@
+"""Canonical move sequences compiled from a table of move permutations.
+
+Two moves belong to the same face when one is a power of the other, and two
+faces commute when their permutations do. A canonical sequence never repeats
+a face back to back and lists commuting faces in table order only, so each
+position is reached by a single ordering of e.g. U D and D U. The same
+tables drive simplify(), which merges and cancels moves in a finished
+solution (R R -> R2, U D U' -> D).
+"""
+
+import numpy as np
+
+
+class MoveOptimizer:
+    def __init__(self, move_table):
+        self.names = list(move_table)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        perms = np.array([move_table[name] for name in self.names], dtype=np.intp)
+        n = len(self.names)
+        identity = np.arange(perms.shape[1])
+
+        # Composition of a then b is perms[a][perms[b]]
+        self.commute = np.array([[np.array_equal(perms[a][perms[b]], perms[b][perms[a]])
+                                  for b in range(n)] for a in range(n)])
+
+        # Group each move with its powers; the first move of a group is its unit turn
+        self.group = [-1] * n
+        self.power = [0] * n
+        self.order = []
+        self._by_power = {}
+        keys = {perm.tobytes(): i for i, perm in enumerate(perms)}
+        for i in range(n):
+            if self.group[i] >= 0:
+                continue
+            g = len(self.order)
+            power, current = 1, perms[i]
+            while not np.array_equal(current, identity):
+                j = keys.get(current.tobytes())
+                if j is not None and self.group[j] < 0:
+                    self.group[j], self.power[j] = g, power
+                    self._by_power[g, power] = self.names[j]
+                power += 1
+                current = current[perms[i]]
+            self.order.append(power)
+
+        # allowed[a][b]: b may follow a in a canonical sequence
+        group = np.array(self.group)
+        same_group = group[:, None] == group[None, :]
+        out_of_order = self.commute & (group[None, :] < group[:, None])
+        self.allowed = ~same_group & ~out_of_order
+
+    def branching_factor(self):
+        """Asymptotic number of children per node of a canonical search"""
+        return float(max(abs(np.linalg.eigvals(self.allowed.astype(float)))))
+
+    def is_canonical(self, moves):
+        indices = [self.index[name] for name in moves]
+        return all(self.allowed[a][b] for a, b in zip(indices, indices[1:]))
+
+    def _merge(self, out, a):
+        """Fold move a into the sequence out; False if it has to be appended instead"""
+        for j in range(len(out) - 1, -1, -1):
+            b = self.index.get(out[j])
+            if b is None:
+                return False
+            if self.group[b] == self.group[a]:
+                g = self.group[a]
+                power = (self.power[a] + self.power[b]) % self.order[g]
+                if power == 0:
+                    del out[j]
+                elif (g, power) in self._by_power:
+                    out[j] = self._by_power[g, power]
+                else:
+                    return False
+                return True
+            # Only moves that commute with a can be stepped over
+            if not self.commute[a][b]:
+                return False
+        return False
+
+    def _merge_pass(self, moves):
+        out = []
+        for name in moves:
+            a = self.index.get(name)
+            if a is None or not self._merge(out, a):
+                out.append(name)
+        return out
+
+    def simplify(self, moves):
+        """Merge same-face moves and drop cancelling ones until nothing changes"""
+        moves = list(moves)
+        while True:
+            simplified = self._merge_pass(moves)
+            if len(simplified) == len(moves):
+                return simplified
+            moves = simplified
@@ -0,0 +1,185 @@
+"""Optimal 2x2 solving from a complete distance table.
+
+With the DBL corner held fixed, the 2x2 has 7! * 3^6 = 3,674,160 positions,
+all reachable with U, R and F turns. A BFS over them stores each distance
+modulo 3 in 2 bits; since a move changes the distance by at most one, the
+neighbour whose value is one less (mod 3) is always one step closer, so
+greedy descent yields an optimal solution.
+"""
+
+from itertools import permutations
+
+import numpy as np
+
+from cubie import (
+    BASIC_MOVES, CORNER_FACELETS, DBL, MOVE_NAMES, CubieCube, InvalidCubeError, facelet_permutation,
+    permutation_rank, relabel_from_dbl,
+)
+from cube_state import bfs_layers, compile_moves, decode_states, encode_states, stack_moves
+from pattern_db import build_pruning_table, load_tables
+from two_phase import rank_rows
+
+# U, R and F turns leave the DBL corner in place
+MOVES = MOVE_NAMES[:9]
+N_MOVES = len(MOVES)
+N_PERM = 5040
+N_TWIST = 729
+N_STATES = N_PERM * N_TWIST
+
+# The seven corner positions other than DBL
+FREE_CORNERS = [0, 1, 2, 3, 4, 5, 7]
+
+TABLE_GROUP = "optimal_2x2"
+TABLE_NAMES = ["perm_move", "twist_move", "distance"]
+PACKED_TABLES = {"distance": 2}
+
+
+def _sticker_index(facelet):
+    """Map a 3x3 corner facelet index to the 24-sticker 2x2 layout"""
+    face, offset = divmod(facelet, 9)
+    row, col = divmod(offset, 3)
+    return face * 4 + (row // 2) * 2 + col // 2
+
+
+CORNER_STICKERS = [[_sticker_index(f) for f in facelets] for facelets in CORNER_FACELETS]
+
+
+def sticker_permutation(move):
+    """Sticker permutation of a move on the 24-sticker layout, from the 3x3 corner facelets"""
+    perm = facelet_permutation(move)
+    perm_2x2 = list(range(24))
+    for facelets in CORNER_FACELETS:
+        for facelet in facelets:
+            perm_2x2[_sticker_index(facelet)] = _sticker_index(perm[facelet])
+    return perm_2x2
+
+
+def _move_cubes():
+    cubes = []
+    for face in "URF":
+        quarter = BASIC_MOVES[face]
+        half = quarter.multiply(quarter)
+        cubes.extend([quarter, half, half.multiply(quarter)])
+    return cubes
+
+
+MOVE_CUBES = _move_cubes()
+
+
+def _perm_move_table():
+    # Corner cubie 7 (DRB) takes rank slot 6 since DBL never moves
+    slots = np.array(FREE_CORNERS)
+    perms = slots[np.array(list(permutations(range(7))))]
+    to_slot = np.zeros(8, dtype=np.int64)
+    to_slot[slots] = np.arange(7)
+    table = np.empty((N_PERM, N_MOVES), dtype=np.uint16)
+    full = np.full((N_PERM, 8), DBL)
+    full[:, slots] = perms
+    for m, cube in enumerate(MOVE_CUBES):
+        moved = full[:, cube.cp][:, slots]
+        table[:, m] = rank_rows(to_slot[moved])
+    return table
+
+
+def _twist_move_table():
+    digits = np.arange(N_TWIST)[:, None] // 3 ** np.arange(5, -1, -1) % 3
+    co = np.zeros((N_TWIST, 8), dtype=np.int64)
+    co[:, :6] = digits
+    co[:, 7] = -digits.sum(axis=1) % 3
+    table = np.empty((N_TWIST, N_MOVES), dtype=np.uint16)
+    for m, cube in enumerate(MOVE_CUBES):
+        new_co = (co[:, cube.cp] + cube.co) % 3
+        table[:, m] = new_co[:, :6] @ 3 ** np.arange(5, -1, -1)
+    return table
+
+
+def build_tables():
+    perm_move = _perm_move_table()
+    twist_move = _twist_move_table()
+    distance = build_pruning_table(N_TWIST, twist_move, N_PERM, perm_move)
+    return {
+        "perm_move": perm_move,
+        "twist_move": twist_move,
+        "distance": distance % 3,
+    }
+
+
+_TABLES = None
+
+
+def get_tables():
+    global _TABLES
+    if _TABLES is None:
+        tables = load_tables(TABLE_GROUP, TABLE_NAMES, build_tables, PACKED_TABLES)
+        _TABLES = {name: memoryview(table.reshape(-1)) for name, table in tables.items()}
+    return _TABLES
+
+
+def normalize_colors(state):
+    """Relabel the colors of a 24-sticker 2x2 string so the DBL corner is solved"""
+    return relabel_from_dbl(state, *(state[i] for i in CORNER_STICKERS[DBL]))
+
+
+def to_cubie(state):
+    """Corner cubies of a 24-sticker 2x2 string, relabelled so the DBL corner is solved"""
+    state = normalize_colors(state)
+    # Reuse the 3x3 decoder by placing the 2x2 corners into an otherwise solved 3x3
+    facelets = list(CubieCube().to_facelets())
+    for stickers, facelet_indices in zip(CORNER_STICKERS, CORNER_FACELETS):
+        for sticker, facelet in zip(stickers, facelet_indices):
+            facelets[facelet] = state[sticker]
+    cube = CubieCube.from_facelets(facelets)
+    if sum(cube.co) % 3:
+        raise InvalidCubeError(
+            f"Corner twist is off by {sum(cube.co) % 3} (a corner has been twisted in place)")
+    return cube
+
+
+def coordinate(cube):
+    slots = {c: i for i, c in enumerate(FREE_CORNERS)}
+    perm = permutation_rank([slots[cube.cp[p]] for p in FREE_CORNERS])
+    twist = 0
+    for i in range(6):
+        twist = 3 * twist + cube.co[i]
+    return perm * N_TWIST + twist
+
+
+def solve(cube):
+    """Optimal move sequence for a CubieCube with its DBL corner solved, and the table lookups it took"""
+    tables = get_tables()
+    perm_move = tables["perm_move"]
+    twist_move = tables["twist_move"]
+    distance = tables["distance"]
+
+    index = coordinate(cube)
+    perm, twist = divmod(index, N_TWIST)
+    moves = []
+    lookups = 0
+    while index:
+        closer = (distance[index >> 2] >> ((index & 3) << 1) & 3) - 1
+        lookups += 1
+        for m in range(N_MOVES):
+            perm1 = perm_move[perm * N_MOVES + m]
+            twist1 = twist_move[twist * N_MOVES + m]
+            child = perm1 * N_TWIST + twist1
+            lookups += 1
+            if distance[child >> 2] >> ((child & 3) << 1) & 3 == closer % 3:
+                moves.append(MOVES[m])
+                index, perm, twist = child, perm1, twist1
+                break
+        else:
+            raise ValueError("Position is not in the distance table")
+    return moves, {"lookups": lookups}
+
+
+def check_tables(depth=5):
+    """Cross-check the distance table against a sticker-level BFS of the first layers"""
+    distance = get_tables()["distance"]
+    _, move_stack = stack_moves(compile_moves({m: sticker_permutation(m) for m in MOVES}))
+    layers = bfs_layers(encode_states(["UUUURRRRFFFFDDDDLLLLBBBB"]), move_stack, depth)
+    for d, layer in enumerate(layers):
+        for state in decode_states(layer):
+            index = coordinate(to_cubie(state))
+            if distance[index >> 2] >> ((index & 3) << 1) & 3 != d % 3:
+                return False
+    return True
@@ -1,3 +1,19 @@
+"""Pattern databases: the algorithm snippets and the solver's precomputed tables.
+
+Move and pruning tables are written once to versioned binary files and loaded
+through numpy.memmap, so every worker process shares one page-cached copy.
+Run ``python pattern_db.py build`` to regenerate them and ``verify`` to check
+their checksums.
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+
+import numpy as np
+
 PATTERN_DB = {
     "cross": {
         "cross_solved": {"moves": [], "heuristic": 0},
@@ -29,3 +45,158 @@ PATTERN_DB = {
         "2x2_sune": {"moves": ["R", "U", "R'", "U", "R", "U2", "R'"], "heuristic": 4}
     }
 }
+
+
+TABLE_VERSION = 2
+TABLES_DIR = os.environ.get(
+    "CUBE_TABLES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables"))
+
+_MAGIC = b"CUBETBL\0"
+# magic, version, bits per entry (8 = unpacked), dtype, rows, cols, sha256 of the payload
+_HEADER = struct.Struct("<8sII8sQQ32s")
+_HEADER_SIZE = 128
+_UNVISITED = 255
+
+
+def build_pruning_table(size_a, move_a, size_b, move_b):
+    """BFS distance table over the product coordinate b * size_a + a, solved state at 0"""
+    dist = np.full(size_a * size_b, _UNVISITED, dtype=np.uint8)
+    dist[0] = 0
+    move_a = move_a.astype(np.int64)
+    move_b = move_b.astype(np.int64)
+    depth = 0
+    frontier = np.array([0], dtype=np.int64)
+    while len(frontier):
+        b, a = np.divmod(frontier, size_a)
+        children = (move_b[b] * size_a + move_a[a]).reshape(-1)
+        dist[children[dist[children] == _UNVISITED]] = depth + 1
+        depth += 1
+        frontier = np.flatnonzero(dist == depth)
+    return dist
+
+
+def pack_bits(values, bits):
+    """Pack small values 8 // bits per byte, lowest index in the lowest bits"""
+    per_byte = 8 // bits
+    if values.max() >= 1 << bits:
+        raise ValueError(f"Values above {(1 << bits) - 1} do not fit in {bits} bits")
+    padded = np.zeros(-(-len(values) // per_byte) * per_byte, dtype=np.uint8)
+    padded[:len(values)] = values
+    packed = np.zeros(len(padded) // per_byte, dtype=np.uint8)
+    for k in range(per_byte):
+        packed |= padded[k::per_byte] << (k * bits)
+    return packed
+
+
+def unpack_bits(packed, bits, count):
+    per_byte = 8 // bits
+    values = np.empty(len(packed) * per_byte, dtype=np.uint8)
+    for k in range(per_byte):
+        values[k::per_byte] = (packed >> (k * bits)) & ((1 << bits) - 1)
+    return values[:count]
+
+
+def table_path(group, name):
+    return os.path.join(TABLES_DIR, f"{group}.{name}.v{TABLE_VERSION}.bin")
+
+
+def write_table(path, array, bits=8):
+    payload = pack_bits(array, bits) if bits < 8 else np.ascontiguousarray(array)
+    rows = len(array)
+    cols = array.shape[1] if array.ndim == 2 else 0
+    header = _HEADER.pack(_MAGIC, TABLE_VERSION, bits, payload.dtype.str.encode(),
+                          rows, cols, hashlib.sha256(payload.tobytes()).digest())
+    # Write to a temporary file first so concurrent workers never see a partial table
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(_HEADER_SIZE, b"\0"))
+        f.write(payload.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        magic, version, bits, dtype, rows, cols, digest = _HEADER.unpack(
+            f.read(_HEADER_SIZE)[:_HEADER.size])
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a table file")
+    return {
+        "version": version,
+        "bits": bits,
+        "dtype": np.dtype(dtype.rstrip(b"\0").decode()),
+        "shape": (rows, cols) if cols else (rows,),
+        "sha256": digest,
+    }
+
+
+def load_table(path):
+    """Memory-map a table file; bit-packed tables stay packed"""
+    header = read_header(path)
+    if header["version"] != TABLE_VERSION:
+        raise ValueError(f"{path} has version {header['version']}, expected {TABLE_VERSION}")
+    bits = header["bits"]
+    shape = header["shape"] if bits == 8 else (-(-header["shape"][0] * bits // 8),)
+    return np.memmap(path, dtype=header["dtype"], mode="r", offset=_HEADER_SIZE, shape=shape)
+
+
+def verify_table(path):
+    header = read_header(path)
+    payload = np.fromfile(path, dtype=np.uint8, offset=_HEADER_SIZE)
+    return (header["version"] == TABLE_VERSION
+            and hashlib.sha256(payload.tobytes()).digest() == header["sha256"])
+
+
+def load_tables(group, names, builder, packed=None):
+    """Memory-map a group of tables, building and writing them first if missing or stale"""
+    paths = {name: table_path(group, name) for name in names}
+    try:
+        return {name: load_table(path) for name, path in paths.items()}
+    except (OSError, ValueError):
+        pass
+    write_tables(group, builder(), packed)
+    return {name: load_table(path) for name, path in paths.items()}
+
+
+def write_tables(group, tables, packed=None):
+    """Write a group of tables; packed maps table names to bits per entry"""
+    packed = packed or {}
+    os.makedirs(TABLES_DIR, exist_ok=True)
+    for name, array in tables.items():
+        write_table(table_path(group, name), array, bits=packed.get(name, 8))
+
+
+def _table_modules():
+    import optimal_2x2
+    import reduction
+    import two_phase
+    return [two_phase, optimal_2x2, reduction]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the solver's precomputed tables")
+    parser.add_argument("command", choices=["build", "verify"])
+    args = parser.parse_args(argv)
+
+    ok = True
+    for module in _table_modules():
+        if args.command == "build":
+            print(f"Building {module.TABLE_GROUP} tables in {TABLES_DIR}")
+            write_tables(module.TABLE_GROUP, module.build_tables(), module.PACKED_TABLES)
+        for name in module.TABLE_NAMES:
+            path = table_path(module.TABLE_GROUP, name)
+            try:
+                valid = verify_table(path)
+            except (OSError, ValueError) as e:
+                valid = False
+                print(f"  {name}: {e}")
+            ok = ok and valid
+            print(f"  {os.path.basename(path)}: {'ok' if valid else 'FAILED'}")
+        if ok and hasattr(module, "check_tables"):
+            consistent = module.check_tables()
+            ok = ok and consistent
+            print(f"  {module.TABLE_GROUP} search cross-check: {'ok' if consistent else 'FAILED'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""Reduction solver for 4x4 and 5x5 cubes.
+
+Cubies fall into orbits by where they sit: corners, midges and wings along
+the edges, and the center orbits. After single turns fix the corner and
+wing permutation parities, the center and edge orbits are solved one at a
+time, each by greedily applying whichever algorithm from its library fixes
+the most stickers. A library holds short commutators, and their conjugates
+by one turn, that move at most three of the orbit's cubies and leave every
+orbit solved before it in place. What remains is a 3x3 with only its
+corners unsolved, which the two-phase solver finishes with outer turns.
+
+The libraries are stored as tables next to the two-phase ones; run
+``python pattern_db.py build`` to regenerate them.
+"""
+
+import time
+from collections import Counter
+from functools import cache
+
+import numpy as np
+
+import two_phase
+from cube_geometry import FACE_AXES, FACES, MOVE_SUFFIXES, MOVE_TABLES, facelet_positions
+from cubie import OPPOSITE_FACES, CubieCube, InvalidCubeError, relabel_from_dbl
+from pattern_db import load_tables
+from search_budget import SearchBudget
+
+SIZES = (4, 5)
+# Orbits in solving order, named by the sorted absolute (doubled) coordinates of their cubie centers
+SOLVE_ORDER = {
+    4: [(1, 1, 3), (1, 3, 3)],                        # x-centers, wings
+    5: [(0, 4, 4), (2, 2, 4), (0, 2, 4), (2, 4, 4)],  # midges, x-centers, t-centers, wings
+}
+ORBIT_NAMES = {(1, 1, 3): "x-centers", (1, 3, 3): "wings", (0, 4, 4): "midges", (2, 2, 4): "x-centers",
+               (0, 2, 4): "t-centers", (2, 4, 4): "wings"}
+# A quarter turn of this inner slice flips the wing permutation parity without touching corners or midges
+WING_PARITY_MOVE = "2R"
+# A quarter turn of an outer face flips the corner (and on odd cubes midge) permutation parity
+CORNER_PARITY_MOVE = "U"
+
+TABLE_GROUP = "reduction"
+TABLE_NAMES = [f"{n}x{n}_{stage}_{kind}" for n in SIZES for stage in range(len(SOLVE_ORDER[n]))
+               for kind in ("perms", "moves")]
+PACKED_TABLES = {}
+
+def solver_moves(n):
+    """Outer face turns and the inner slices parallel to U, R and F"""
+    return ([face + suffix for face in FACES for suffix in MOVE_SUFFIXES]
+            + [f"{depth}{face}{suffix}" for depth in range(2, n) for face in "URF" for suffix in MOVE_SUFFIXES])
+
+
+def inverse_move(move):
+    if move.endswith("'"):
+        return move[:-1]
+    return move if move.endswith("2") else move + "'"
+
+
+def solver_move(move, n):
+    """The solver move equal to move: an inner slice counted from D, L or B is the same
+    slice counted from the opposite face, turned the other way"""
+    base = move.rstrip("2'")
+    if not base[:-1].isdigit() or base[-1] not in "DLB":
+        return move
+    return f"{n + 1 - int(base[:-1])}{OPPOSITE_FACES[base[-1]]}{inverse_move(move)[len(base):]}"
+
+
+@cache
+def cubies(n):
+    """{doubled cubie center: its sticker indices in face order}"""
+    result = {}
+    for i, p in enumerate(facelet_positions(n)):
+        normal = FACE_AXES[FACES[i // (n * n)]][0]
+        result.setdefault(tuple(c - a for c, a in zip(p, normal)), []).append(i)
+    return result
+
+
+@cache
+def orbit_cubies(n, shape):
+    return [stickers for center, stickers in cubies(n).items()
+            if tuple(sorted(map(abs, center))) == shape]
+
+
+def orbit_stickers(n, shape):
+    return np.array(sorted(i for stickers in orbit_cubies(n, shape) for i in stickers), dtype=np.intp)
+
+
+def solved_state(n):
+    return ''.join(face * (n * n) for face in FACES)
+
+
+# The D, B and L stickers of the DBL corner, which fix the colors of even cubes
+DBL_STICKERS = {n: [cubies(n)[(1 - n,) * 3][k] for k in (0, 2, 1)] for n in SIZES}
+
+
+def normalize_colors(state, n):
+    """Relabel stickers by the face they belong on: by the centers on odd cubes, by the DBL corner on even ones"""
+    if n % 2:
+        centers = {state[i * n * n + n * n // 2]: face for i, face in enumerate(FACES)}
+        if len(centers) != 6:
+            raise InvalidCubeError("Center colors are not all different")
+        return ''.join(centers.get(c, c) for c in state)
+    return relabel_from_dbl(state, *(state[i] for i in DBL_STICKERS[n]))
+
+
+def _sequence_perm(perms, sequence):
+    perm = np.arange(perms.shape[1])
+    for m in sequence:
+        perm = perm[perms[m]]
+    return perm
+
+
+def _commutators(perms, inverse, layer, stickers, fixed, max_moved):
+    """{effect on stickers: (permutation, moves)} for commutators [A, B] that keep fixed in place
+    and move between 1 and max_moved of stickers, with A up to two turns and B one turn, or
+    A one turn and B a conjugate X Y X'"""
+    n_moves = len(perms)
+    singles = [(m,) for m in range(n_moves)]
+    pairs = [(a, b) for a in range(n_moves) for b in range(n_moves) if layer[a] != layer[b]]
+    conjugates = [(a, b, inverse[a]) for a, b in pairs]
+    found = {}
+    for firsts, seconds in ((singles + pairs, singles), (singles, conjugates)):
+        first = np.stack([_sequence_perm(perms, s) for s in firsts])
+        first_inverse = np.argsort(first, axis=1)
+        rows = np.arange(len(firsts))[:, None]
+        for second in seconds:
+            p = _sequence_perm(perms, second)
+            comm = first[:, p][rows, first_inverse][:, np.argsort(p)]
+            moved = (comm[:, stickers] != stickers).sum(1)
+            ok = (moved > 0) & (moved <= max_moved) & (comm[:, fixed] == fixed).all(1)
+            for k in np.flatnonzero(ok):
+                a = firsts[k]
+                moves = (list(a) + list(second) + [inverse[m] for m in reversed(a)]
+                         + [inverse[m] for m in reversed(second)])
+                key = comm[k, stickers].tobytes()
+                if key not in found or len(moves) < len(found[key][1]):
+                    found[key] = (comm[k], moves)
+    return found
+
+
+def _add_conjugates(found, perms, inverse, stickers, rounds=2):
+    """Add conjugates by up to rounds turns of the algorithms found, for the effects not found yet"""
+    algorithms = list(found.values())
+    for _ in range(rounds):
+        added = []
+        effects = np.stack([perm for perm, _ in algorithms])
+        for m in range(len(perms)):
+            conjugated = perms[m][effects][:, perms[inverse[m]]]
+            for perm, (_, moves) in zip(conjugated, algorithms):
+                key = perm[stickers].tobytes()
+                if key not in found:
+                    found[key] = (perm, [m] + moves + [inverse[m]])
+                    added.append(found[key])
+        if not added:
+            return
+        algorithms = added
+
+
+def build_tables():
+    tables = {}
+    for n in SIZES:
+        names = solver_moves(n)
+        perms = np.stack([MOVE_TABLES[n][m] for m in names])
+        inverse = [names.index(inverse_move(m)) for m in names]
+        layer = [m.rstrip("2'") for m in names]
+        # The fixed centers of odd cubes never move, so the solved state is fixed by them
+        fixed = orbit_stickers(n, (0, 0, n - 1)) if n % 2 else np.array([], dtype=np.intp)
+        for stage, shape in enumerate(SOLVE_ORDER[n]):
+            stickers = orbit_stickers(n, shape)
+            cubie_size = sum(c == n - 1 for c in shape)
+            found = _commutators(perms, inverse, layer, stickers, fixed, 3 * cubie_size)
+            _add_conjugates(found, perms, inverse, stickers)
+            # Shortest first, so the greedy pass prefers short algorithms on ties
+            algorithms = sorted(found.values(), key=lambda a: len(a[1]))
+            longest = len(algorithms[-1][1])
+            tables[f"{n}x{n}_{stage}_perms"] = np.stack([perm for perm, _ in algorithms]).astype(np.int16)
+            tables[f"{n}x{n}_{stage}_moves"] = np.array(
+                [moves + [-1] * (longest - len(moves)) for _, moves in algorithms], dtype=np.int8)
+            fixed = np.concatenate([fixed, stickers])
+    return tables
+
+
+class _Stage:
+    """One orbit's algorithms, with the stickers each moves padded by a dummy sticker past the state"""
+
+    def __init__(self, n, shape, perms, moves):
+        self.stickers = orbit_stickers(n, shape)
+        self.perms = perms
+        self.moves = moves
+        self.lengths = (moves >= 0).sum(1)
+        size = perms.shape[1]
+        moved = perms[:, self.stickers] != self.stickers
+        order = np.argsort(~moved, axis=1, kind="stable")[:, :moved.sum(1).max()]
+        is_moved = np.take_along_axis(moved, order, axis=1)
+        self.dst = np.where(is_moved, self.stickers[order], size)
+        self.src = np.where(is_moved, np.take_along_axis(perms, np.minimum(self.dst, size - 1), axis=1), size)
+
+
+class ReductionStalled(RuntimeError):
+    """Raised when no algorithm in an orbit's library makes progress on a valid cube"""
+
+    def __init__(self, n, stage):
+        super().__init__(f"Reduction got stuck solving the {ORBIT_NAMES[SOLVE_ORDER[n][stage]]} of the {n}x{n}")
+        self.stage = stage
+
+
+_TABLES = {}
+
+
+def get_tables(n):
+    if n not in _TABLES:
+        tables = load_tables(TABLE_GROUP, TABLE_NAMES, build_tables, PACKED_TABLES)
+        for size in SIZES:
+            _TABLES[size] = [_Stage(size, shape, tables[f"{size}x{size}_{stage}_perms"],
+                                    tables[f"{size}x{size}_{stage}_moves"])
+                             for stage, shape in enumerate(SOLVE_ORDER[size])]
+    return _TABLES[n]
+
+
+def _encode(state):
+    return np.frombuffer(state.encode("ascii"), dtype=np.uint8)
+
+
+def _apply(state, n, moves):
+    for move in moves:
+        state = state[MOVE_TABLES[n][move]]
+    return state
+
+
+def _corner_parity(state, n):
+    """Permutation parity of the corners, identified by their colors"""
+    solved = solved_state(n)
+    corners = orbit_cubies(n, (n - 1,) * 3)
+    home = {frozenset(solved[i] for i in stickers): slot for slot, stickers in enumerate(corners)}
+    perm = [home[frozenset(chr(state[i]) for i in stickers)] for stickers in corners]
+    swaps = 0
+    for i in range(len(perm)):
+        while perm[i] != i:
+            j = perm[i]
+            perm[i], perm[j] = perm[j], perm[i]
+            swaps += 1
+    return swaps % 2
+
+
+def _gains(state, stage, target):
+    """Stickers of the orbit each algorithm would solve, less those it would unsolve"""
+    padded = np.append(state, 0)
+    return (padded[stage.src] == target).sum(1) - (padded[stage.dst] == target).sum(1)
+
+
+def _best_pair(state, stage, target, gains):
+    """The best two algorithms in a row, tried when no single one helps; None if no pair does either"""
+    touches_unsolved = ((np.append(state, 0)[stage.dst] != target) & (stage.dst < len(state))).any(1)
+    # First moves that lose nothing are usually enough and much fewer, so try them on their own first
+    for firsts in (touches_unsolved & (gains >= 0), touches_unsolved & (gains < 0)):
+        best, best_gain = None, 0
+        for first in np.flatnonzero(firsts):
+            after = _gains(state[stage.perms[first]], stage, target)
+            second = int(np.argmax(after))
+            if gains[first] + after[second] > best_gain:
+                best, best_gain = (int(first), second), gains[first] + after[second]
+        if best is not None:
+            return best
+    return None
+
+
+def _solve_orbit(state, solved, stage, budget):
+    """Greedily apply the stage's algorithms until its orbit is solved; None if it gets stuck"""
+    moves = []
+    target = np.append(solved, 0)[stage.dst]
+    while not np.array_equal(state[stage.stickers], solved[stage.stickers]):
+        if budget.exhausted(0):
+            raise TimeoutError("Search budget ran out while reducing the cube")
+        gains = _gains(state, stage, target)
+        best = int(np.argmax(gains))
+        chosen = [best] if gains[best] > 0 else _best_pair(state, stage, target, gains)
+        if chosen is None:
+            return None, state
+        for k in chosen:
+            state = state[stage.perms[k]]
+            moves.extend(int(m) for m in stage.moves[k][:stage.lengths[k]])
+    return moves, state
+
+
+def _reduce(start, solved, n, stages, setup, budget):
+    names = solver_moves(n)
+    state = _apply(start, n, setup)
+    moves = list(setup)
+    for i, stage in enumerate(stages):
+        stage_moves, state = _solve_orbit(state, solved, stage, budget)
+        if stage_moves is None:
+            raise ReductionStalled(n, i)
+        moves.extend(names[m] for m in stage_moves)
+    return moves, state
+
+
+def check_state(state, n):
+    """Raise InvalidCubeError unless every cubie of a normalized state is one the cube has"""
+    solved = solved_state(n)
+    for shape in {tuple(sorted(map(abs, c))) for c in cubies(n)}:
+        pieces = orbit_cubies(n, shape)
+        expected = Counter(frozenset(solved[i] for i in stickers) for stickers in pieces)
+        found = Counter(frozenset(state[i] for i in stickers) for stickers in pieces)
+        if found != expected:
+            extra = next(iter(found - expected))
+            raise InvalidCubeError(f"A cubie has stickers {''.join(sorted(extra))}, which no cubie of the cube has")
+    wings = [pieces[tuple(state[i] for i in slot)] for slot, pieces in _wing_pieces(n).items()]
+    if len(set(wings)) != len(wings):
+        raise InvalidCubeError("A wing edge piece has been flipped in place")
+    corners = _three_by_three(_encode(state), n, with_edges=n % 2 == 1)
+    if n % 2:
+        corners.verify()
+    elif sum(corners.co) % 3:
+        raise InvalidCubeError(
+            f"Corner twist is off by {sum(corners.co) % 3} (a corner has been twisted in place)")
+
+
+_WING_PIECES = {}
+
+
+def _wing_pieces(n):
+    """{wing slot's sticker indices: {colors it shows, in sticker order: the wing showing them}}.
+
+    The two wings of an edge are mirror images, so in any one slot they show
+    their colors in opposite orders. A wing flipped in place therefore looks
+    like its twin, which then appears twice.
+    """
+    if n not in _WING_PIECES:
+        solved = solved_state(n)
+        # A move sends the sticker at position p to inverse[p]
+        inverses = [np.argsort(MOVE_TABLES[n][move]) for move in solver_moves(n)]
+        slots = [tuple(stickers) for stickers in orbit_cubies(n, SOLVE_ORDER[n][-1])]
+        pieces = {slot: {} for slot in slots}
+        for home in slots:
+            colors = dict(zip(home, (solved[i] for i in home)))
+            seen, frontier = {home}, [home]
+            while frontier:
+                positions = frontier.pop()
+                for inverse in inverses:
+                    moved = tuple(int(inverse[p]) for p in positions)
+                    if moved not in seen:
+                        seen.add(moved)
+                        frontier.append(moved)
+            for positions in seen:
+                at = dict(zip(positions, home))
+                pieces[tuple(sorted(positions))][tuple(colors[at[p]] for p in sorted(positions))] = home
+        _WING_PIECES[n] = pieces
+    return _WING_PIECES[n]
+
+
+def _three_by_three(state, n, with_edges=False):
+    """The corners (and midges, on odd cubes) of a normalized state as a 3x3, all else solved"""
+    facelets = list(solved_state(3))
+    cells = [(0, 0), (0, 2), (2, 0), (2, 2)] + ([(0, 1), (1, 0), (1, 2), (2, 1)] if with_edges else [])
+    for face in range(6):
+        for row, col in cells:
+            # Row and column 1 of the 3x3 are the middle ones of an odd cube
+            source = face * n * n + (row * (n - 1) // 2) * n + col * (n - 1) // 2
+            facelets[face * 9 + row * 3 + col] = chr(state[source])
+    return CubieCube.from_facelets(''.join(facelets))
+
+
+def solve(state, n, budget=None, profile=False):
+    """Solve a normalized n x n facelet string: (reduction moves, 3x3 moves, stats).
+
+    Raises TimeoutError if the budget runs out and ReductionStalled if the
+    greedy pass gets stuck; check_state() rejects states that cannot be solved.
+    """
+    budget = budget or SearchBudget()
+    stages = get_tables(n)
+    start = _encode(state)
+    solved = _encode(solved_state(n))
+    setup = [CORNER_PARITY_MOVE] if _corner_parity(start, n) else []
+    reduce_start = time.time()
+    try:
+        reduction, reduced = _reduce(start, solved, n, stages, setup, budget)
+    except ReductionStalled as e:
+        # Odd wing parity leaves two wings swapped at the very end; anything else is a real stall
+        if e.stage != len(stages) - 1:
+            raise
+        reduction, reduced = _reduce(start, solved, n, stages, setup + [WING_PARITY_MOVE], budget)
+    reduction_time = time.time() - reduce_start
+
+    phase1, phase2, stats = two_phase.solve(_three_by_three(reduced, n), budget=budget, profile=profile)
+    if phase1 is None:
+        raise TimeoutError("Search budget ran out before the reduced cube was solved")
+    finish = phase1 + phase2
+    if not np.array_equal(_apply(reduced, n, finish), solved):
+        raise RuntimeError("Reduction left the cube unsolved")
+    return reduction, finish, dict(stats, reduction_time=reduction_time, reduction_moves=len(reduction))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator, model_validator
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional
 
 ValidFace = Literal['U', 'R', 'F', 'D', 'L', 'B']
 ValidColor = Literal['white', 'yellow', 'green', 'blue', 'red', 'orange']
@@ -7,19 +7,35 @@ ValidColor = Literal['white', 'yellow', 'green', 'blue', 'red', 'orange']
 class SolveRequest(BaseModel):
     faces: Dict[ValidFace, List[ValidColor]]
     size: int = 3
+    # Search budget: wall-clock milliseconds and nodes expanded
+    max_ms: Optional[int] = None
+    max_nodes: Optional[int] = None
+    # Keep looking for shorter solutions until one has at most this many moves
+    max_moves: Optional[int] = None
+    # Search the 3x3 tree on all solver workers at once
+    parallel: bool = False
+    # Also return every intermediate state as per-move sticker deltas
+    trajectory: bool = False
 
     @field_validator('size')
     @classmethod
     def check_supported_size(cls, v):
-        if v not in [2, 3]:
-            raise ValueError("Only 2x2 and 3x3 cubes are supported.")
+        if v not in [2, 3, 4, 5]:
+            raise ValueError("Only 2x2 to 5x5 cubes are supported.")
+        return v
+
+    @field_validator('max_ms', 'max_nodes', 'max_moves')
+    @classmethod
+    def check_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("Budgets must be positive.")
         return v
 
     @model_validator(mode='after')
     def validate_faces(self):
         faces = self.faces
         size = self.size
-        expected_len = 4 if size == 2 else 9
+        expected_len = size * size
 
         if faces is None or len(faces) != 6:
             raise ValueError("Exactly 6 faces (U, R, F, D, L, B) must be provided.")
@@ -29,3 +45,7 @@ class SolveRequest(BaseModel):
                 raise ValueError(f"Face '{face}' must contain exactly {expected_len} color values.")
 
         return self
+
+class JobRequest(SolveRequest):
+    # Queued jobs with a higher priority run first
+    priority: int = 0
@@ -0,0 +1,41 @@
+"""Wall-clock and node budgets shared by the solvers."""
+
+import time
+
+# Searches look at the clock once per this many nodes
+CHECK_INTERVAL = 1024
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a search to unwind it once its budget is spent"""
+
+
+class SearchBudget:
+    def __init__(self, max_ms=None, max_nodes=None, cancelled=None):
+        self.started = time.monotonic()
+        self.deadline = None if max_ms is None else self.started + max_ms / 1000
+        self.max_nodes = max_nodes
+        # Optional callable polled with the clock, e.g. a flag set by a parallel search that finished
+        self.cancelled = cancelled
+
+    def exhausted(self, nodes):
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            return True
+        if self.cancelled is not None and self.cancelled():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def next_check(self, nodes):
+        """Node count at which the search should call check() again"""
+        check_at = nodes + CHECK_INTERVAL
+        return check_at if self.max_nodes is None else min(check_at, self.max_nodes)
+
+    def check(self, nodes):
+        """Raise BudgetExceeded if spent, otherwise return the next check point"""
+        if self.exhausted(nodes):
+            raise BudgetExceeded
+        return self.next_check(nodes)
+
+    def elapsed_ms(self):
+        return (time.monotonic() - self.started) * 1000
+
@@ -0,0 +1,171 @@
+"""Solution cache keyed on the canonical form of a cube state.
+
+States that differ only by one of the 48 cube symmetries or by a renaming of
+the colors share one entry. Moves are stored in the canonical frame and mapped
+back through the symmetry on a hit. Entries live in an in-memory LRU with a
+TTL, optionally backed by a sqlite file so they survive restarts. The file
+records when each entry was last used in batches and is trimmed to the
+least recently used max_size entries on a timer, so hits and stores rarely
+wait on a disk write.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from cube_geometry import symmetries
+
+CACHE_SIZE = int(os.environ.get("SOLUTION_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("SOLUTION_CACHE_TTL", 24 * 3600))
+CACHE_DB = os.environ.get("SOLUTION_CACHE_DB")
+# The sqlite file is trimmed back to max_size at most this often, in seconds, so it may briefly hold more
+CACHE_PRUNE_INTERVAL = float(os.environ.get("SOLUTION_CACHE_PRUNE_INTERVAL", 60))
+# Hits whose last-use time is held back before it is written to the sqlite file
+TOUCH_BATCH = 100
+
+
+def canonical_form(cube):
+    """Smallest color-normalized conjugate of the cube's state and the symmetry giving it"""
+    size = round((len(cube.state) / 6) ** 0.5)
+    state = cube.normalize_colors(str(cube.state))
+    best_key, best_symmetry = None, None
+    for symmetry in symmetries(size):
+        key = cube.normalize_colors(symmetry.apply(state))
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return f"{size}:{best_key}", best_symmetry
+
+
+class SolutionCache:
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, db_path=CACHE_DB, prune_interval=CACHE_PRUNE_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Last-use times of hit keys not yet written to the sqlite file
+        self._touched = {}
+        self._next_prune = time.time() + prune_interval
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+            self._db.execute("DELETE FROM solutions WHERE expires < ?", (time.time(),))
+            self._prune_db()
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._touch(key, now)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.evictions += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires FROM solutions WHERE key = ? AND expires > ?",
+                    (key, now)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._insert(key, value, row[1])
+                    self._touch(key, now)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._insert(key, value, expires)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solutions (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                                 (key, json.dumps(value), expires, now))
+                self._touched.pop(key, None)
+                if now >= self._next_prune:
+                    self._write_back(now)
+                self._db.commit()
+
+    def flush(self):
+        """Write pending last-use times and trim the sqlite file to max_size now"""
+        with self._lock:
+            if self._db is not None:
+                self._write_back(time.time(), prune=True)
+                self._db.commit()
+
+    def _touch(self, key, now):
+        if self._db is None:
+            return
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_BATCH or now >= self._next_prune:
+            self._write_back(now)
+            self._db.commit()
+
+    def _write_back(self, now, prune=False):
+        self._db.executemany("UPDATE solutions SET used = ? WHERE key = ?",
+                             [(used, key) for key, used in self._touched.items()])
+        self._touched.clear()
+        if prune or now >= self._next_prune:
+            self._prune_db()
+            self._next_prune = now + self.prune_interval
+
+    def _prune_db(self):
+        """Drop the least recently used rows past max_size, like the in-memory LRU"""
+        self._db.execute(
+            "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY used "
+            "LIMIT max(0, (SELECT COUNT(*) FROM solutions) - ?))", (self.max_size,))
+
+    def _insert(self, key, value, expires):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, cube):
+        """Cached solution for a cube, mapped back to its own orientation, or None"""
+        start_time = time.time()
+        key, symmetry = canonical_form(cube)
+        value = self.get(key)
+        if value is None:
+            return None
+        moves = symmetry.map_moves(value["moves"], inverse=True)
+        phase1_moves = value["stats"]["phase1_moves"]
+        stats = dict(value["stats"], time=time.time() - start_time, cached=True)
+        return cube.solution_result(moves[:phase1_moves], moves[phase1_moves:], stats)
+
+    def store(self, cube, solution):
+        key, symmetry = canonical_form(cube)
+        moves = symmetry.map_moves(solution["moves"].split())
+        self.put(key, {"moves": moves, "stats": solution["stats"]})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None
+            }
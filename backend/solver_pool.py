@@ -0,0 +1,215 @@
+"""Process pool that runs CPU-bound solves off the event loop."""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import optimal_2x2
+import reduction
+import two_phase
+from cube_solver import Cube2x2, Cube3x3, Cube4x4, Cube5x5
+from metrics import profile_call
+from search_budget import SearchBudget
+
+SOLVER_WORKERS = int(os.environ.get("SOLVER_WORKERS", os.cpu_count() or 1))
+# Wall-clock cap on a single solve when the request does not set max_ms
+SOLVE_MAX_MS = int(os.environ.get("SOLVE_MAX_MS", 10000))
+# Parallel solves split the phase 1 tree at this many moves from the root (18 subtrees for 1, 243 for 2)
+PARALLEL_SPLIT_DEPTH = int(os.environ.get("PARALLEL_SPLIT_DEPTH", 1))
+# Parallel solves that can run at once, each owning one cancel flag shared with the workers
+CANCEL_SLOTS = 64
+# Length of the scramble each worker solves per cube size while warming up
+WARMUP_DEPTH = 20
+
+_POOL = None
+_CANCEL_FLAGS = None
+_FREE_SLOTS = []
+
+
+def load_solver_tables():
+    """Memory-map the solver tables, building them on disk first if needed"""
+    two_phase.get_tables()
+    optimal_2x2.get_tables()
+    reduction.get_tables(reduction.SIZES[0])
+
+
+def _init_worker(cancel_flags):
+    global _CANCEL_FLAGS
+    _CANCEL_FLAGS = cancel_flags
+    load_solver_tables()
+
+
+CUBE_CLASSES = {2: Cube2x2, 3: Cube3x3, 4: Cube4x4, 5: Cube5x5}
+
+
+def make_cube(state_str, size):
+    return CUBE_CLASSES[size](state_str)
+
+
+def solve_state(state_str, size, max_ms=None, max_moves=None, max_nodes=None,
+                submitted=None, profile=False):
+    """Solve one cube state string within a time/node budget; runs inside a pool worker.
+
+    submitted is the time.time() at which the job was queued, used to report the
+    queue wait; with profile the solution carries a cProfile summary.
+    """
+    queue_wait = time.time() - submitted if submitted is not None else None
+    cube = make_cube(state_str, size)
+    cube.validate()
+    budget = SearchBudget(min(max_ms or SOLVE_MAX_MS, SOLVE_MAX_MS), max_nodes)
+    if profile:
+        solution, summary = profile_call(cube.solve, max_moves=max_moves, budget=budget, profile=True)
+        solution["profile"] = summary
+    else:
+        solution = cube.solve(max_moves=max_moves, budget=budget)
+    if queue_wait is not None:
+        solution["queue_wait"] = queue_wait
+    return solution
+
+
+def search_subtree(state_str, prefix, depth, max_length, max_moves, max_ms, max_nodes, submitted, slot):
+    """One subtree of a parallel 3x3 solve; gives up early once the slot's cancel flag is set"""
+    remaining_ms = max(0.0, max_ms - (time.time() - submitted) * 1000)
+    budget = SearchBudget(remaining_ms, max_nodes, cancelled=lambda: _CANCEL_FLAGS[slot])
+    return two_phase.search_subtree(Cube3x3(state_str).to_cubie(), prefix, depth, max_length,
+                                    max_moves, budget)
+
+
+async def solve_state_parallel(state_str, max_ms=None, max_moves=None, max_nodes=None,
+                               split_depth=PARALLEL_SPLIT_DEPTH, progress=None):
+    """Solve a 3x3 with each phase 1 iteration split across all workers.
+
+    Iterations run one depth at a time like the sequential search, but the
+    sequences of each depth are divided by their first split_depth moves
+    (0 runs each iteration as a single task). Once a subtree returns a
+    solution of at most max_moves moves (any solution by default) the rest
+    of the iteration is cancelled. progress(depth=, nodes=) is called after
+    every iteration and progress(best=, best_moves=) whenever a shorter
+    solution turns up.
+    """
+    cube = make_cube(state_str, 3)
+    cube.validate()
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    if not _FREE_SLOTS:
+        # Every cancel flag is taken, so run this one sequentially
+        return await loop.run_in_executor(pool, solve_state, state_str, 3, max_ms, max_moves, max_nodes,
+                                          time.time())
+
+    start_time = time.time()
+    max_ms = min(max_ms or SOLVE_MAX_MS, SOLVE_MAX_MS)
+    target = two_phase.MAX_LENGTH if max_moves is None else max_moves
+    prefixes = two_phase.root_prefixes(split_depth)
+    slot = _FREE_SLOTS.pop()
+    _CANCEL_FLAGS[slot] = 0
+    best, results, nodes, pending = None, [], 0, set()
+    try:
+        for depth in range(two_phase.MAX_LENGTH + 1):
+            max_length = two_phase.MAX_LENGTH if best is None else len(best[0] + best[1]) - 1
+            if depth > max_length:
+                break
+            subtrees = prefixes if depth >= split_depth else [()]
+            round_nodes = None if max_nodes is None else -(-(max_nodes - nodes) // len(subtrees))
+            pending = {loop.run_in_executor(pool, search_subtree, state_str, prefix, depth, max_length,
+                                            max_moves, max_ms, round_nodes, start_time, slot)
+                       for prefix in subtrees}
+            round_truncated = False
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    phase1, phase2, stats = future.result()
+                    results.append(stats)
+                    round_truncated |= stats["truncated"]
+                    if phase1 is not None and (best is None or len(phase1 + phase2) < len(best[0] + best[1])):
+                        best = phase1, phase2
+                        if progress is not None:
+                            progress(best=' '.join(phase1 + phase2), best_moves=len(phase1 + phase2))
+                if best is not None and len(best[0] + best[1]) <= target:
+                    # Good enough: the rest of the round stops at its next budget check
+                    _CANCEL_FLAGS[slot] = 1
+            nodes = sum(stats["nodes"] for stats in results)
+            if progress is not None:
+                progress(depth=depth, nodes=nodes)
+            if _CANCEL_FLAGS[slot] or round_truncated or (max_nodes is not None and nodes >= max_nodes):
+                break
+    finally:
+        _CANCEL_FLAGS[slot] = 1
+        if pending:
+            # Workers may still be unwinding; the slot is reused only once they are done
+            asyncio.ensure_future(asyncio.wait(pending)).add_done_callback(lambda _: _FREE_SLOTS.append(slot))
+        else:
+            _FREE_SLOTS.append(slot)
+
+    found = best is not None and len(best[0] + best[1]) <= target
+    truncated = not found and (any(stats["truncated"] for stats in results)
+                               or (max_nodes is not None and nodes >= max_nodes))
+    if best is None:
+        if truncated:
+            raise TimeoutError("Search budget ran out before any solution was found")
+        # Nothing within the phase 2 depth cap; the sequential solver retries without it on what is left
+        remaining_ms = max_ms - (time.time() - start_time) * 1000
+        if remaining_ms <= 0:
+            raise TimeoutError("Search budget ran out before any solution was found")
+        remaining_nodes = None if max_nodes is None else max_nodes - nodes
+        return await loop.run_in_executor(pool, solve_state, state_str, 3, remaining_ms, max_moves,
+                                          remaining_nodes, time.time())
+
+    nodes_per_depth = {}
+    for stats in results:
+        for depth, count in stats["nodes_per_depth"].items():
+            nodes_per_depth[depth] = nodes_per_depth.get(depth, 0) + count
+    phase1, phase2 = best
+    return cube.solution_result(phase1, phase2, {
+        "time": time.time() - start_time,
+        "method": "Kociemba two-phase, parallel",
+        "subtrees": len(results),
+        "nodes": nodes,
+        "depth": max(stats["depth"] for stats in results),
+        "truncated": truncated,
+        "nodes_per_depth": nodes_per_depth,
+    })
+
+
+def start_pool(workers=SOLVER_WORKERS):
+    global _POOL, _CANCEL_FLAGS
+    if _POOL is None:
+        # Make sure the tables exist on disk so workers only map them
+        load_solver_tables()
+        _CANCEL_FLAGS = multiprocessing.RawArray('b', CANCEL_SLOTS)
+        _FREE_SLOTS[:] = range(CANCEL_SLOTS)
+        _POOL = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(_CANCEL_FLAGS,))
+    return _POOL
+
+
+def get_pool():
+    return _POOL or start_pool()
+
+
+def warm_up():
+    """Solve one scramble per cube size in this worker, so its tables and move caches are hot"""
+    start = time.time()
+    for size, cube_class in CUBE_CLASSES.items():
+        states, _ = cube_class.random_states(reduction.solved_state(size), 1, WARMUP_DEPTH, seed=size)
+        solve_state(states[0].tobytes().decode("ascii"), size)
+    return time.time() - start
+
+
+async def warm_pool(workers=SOLVER_WORKERS):
+    """Build or map the tables off the event loop, then warm the pool's workers; returns the seconds taken"""
+    start = time.time()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, load_solver_tables)
+    pool = get_pool()
+    # Submitted together, so each lands on its own worker unless one finishes early
+    await asyncio.gather(*(loop.run_in_executor(pool, warm_up) for _ in range(workers)))
+    return time.time() - start
+
+
+def shutdown_pool():
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
+        _POOL = None
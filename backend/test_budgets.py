@@ -0,0 +1,47 @@
+"""Per-request time and node budgets, and the anytime solutions they cut short."""
+
+import time
+
+from conftest import assert_solves, scramble, solve
+from cube_solver import Cube3x3
+from search_budget import SearchBudget
+
+
+def test_budget_spent_before_any_solution_is_503(client):
+    response = solve(client, scramble(3, seed=50), 3, max_nodes=1)
+    assert response.status_code == 503
+    assert "budget ran out" in response.json()["detail"]
+
+
+def test_reduction_respects_the_time_budget(client):
+    response = solve(client, scramble(4, seed=50), 4, max_ms=1)
+    assert response.status_code == 503
+
+
+def test_cut_short_search_returns_its_best_solution_uncached(client):
+    state = scramble(3, seed=51)
+    for _ in range(2):
+        response = solve(client, state, 3, max_moves=10, max_ms=1000)
+        assert response.status_code == 200, response.text
+        stats = response.json()["stats"]
+        assert stats["truncated"] and not stats.get("cached")
+        assert_solves(state, 3, response.json()["solution"])
+
+
+def test_node_budget_caps_the_search():
+    cube = Cube3x3(scramble(3, seed=52))
+    solution = cube.solve(max_moves=12, budget=SearchBudget(max_nodes=20000))
+    assert solution["stats"]["truncated"]
+    assert solution["stats"]["nodes"] <= 20000
+
+
+def test_time_budget_expires():
+    budget = SearchBudget(max_ms=10)
+    assert not budget.exhausted(0)
+    time.sleep(0.02)
+    assert budget.exhausted(0)
+
+
+def test_budgets_must_be_positive(client):
+    response = solve(client, scramble(3, seed=53), 3, max_ms=0)
+    assert response.status_code == 422
@@ -0,0 +1,125 @@
+"""Background solve jobs: the scheduler on its own and the /jobs API."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import assert_solves, faces_of, scramble, swapped
+from jobs import JobQueue, QueueFull
+
+
+def test_submit_starts_the_runners():
+    async def scenario():
+        queue = JobQueue()
+
+        async def run(job):
+            return "done"
+
+        job = queue.submit(run)
+        while not job.done:
+            await job.changed().wait()
+        await queue.stop()
+        return job
+
+    assert asyncio.run(scenario()).result == "done"
+
+
+def test_submit_outside_the_event_loop_is_a_clear_error():
+    async def run(job):
+        pass
+
+    with pytest.raises(RuntimeError, match="running event loop"):
+        JobQueue().submit(run)
+
+
+def test_higher_priority_runs_first_and_full_queue_rejects():
+    async def scenario():
+        queue = JobQueue(max_queued=2, max_running=1)
+        order = []
+        release = asyncio.Event()
+
+        def job_named(name):
+            async def run(job):
+                order.append(name)
+                if name == "blocker":
+                    await release.wait()
+            return run
+
+        queue.submit(job_named("blocker"))
+        await asyncio.sleep(0)
+        queue.submit(job_named("low"), priority=0)
+        high = queue.submit(job_named("high"), priority=5)
+        with pytest.raises(QueueFull):
+            queue.submit(job_named("rejected"))
+        release.set()
+        while not high.done or len(order) < 3:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return order, queue.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["blocker", "high", "low"]
+    assert (stats["submitted"], stats["rejected"], stats["completed"]) == (3, 1, 3)
+
+
+def test_failed_and_expired_jobs():
+    async def scenario():
+        queue = JobQueue(ttl=0)
+
+        async def run(job):
+            raise ValueError("no luck")
+
+        job = queue.submit(run)
+        while not job.done:
+            await job.changed().wait()
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(scenario())
+    assert (job.status, job.error) == ("failed", "no luck")
+    assert queue.get(job.id) is None
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """A client running the startup and shutdown hooks, so job runners share one event loop.
+
+    The hooks would otherwise warm every solver worker and shut down the face
+    pool the other tests keep using.
+    """
+    async def warm_up():
+        return 0.0
+
+    monkeypatch.setattr(main, "warm_up", warm_up)
+    monkeypatch.setattr(main, "FACE_POOL", ThreadPoolExecutor(max_workers=1))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_job_runs_and_streams_its_result(served):
+    state = scramble(3, seed=70)
+    response = served.post("/jobs", json={"faces": faces_of(state, 3), "priority": 1})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    with served.stream("GET", f"/jobs/{job_id}/events") as events:
+        names = [line[len("event: "):] for line in events.iter_lines() if line.startswith("event: ")]
+    assert names[-1] == "done"
+
+    job = served.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "done" and job["progress"]["depth"] >= 0
+    assert_solves(state, 3, job["result"]["solution"])
+
+
+def test_bad_submissions_are_rejected(served, monkeypatch):
+    state = scramble(3, seed=71)
+    response = served.post("/jobs", json={"faces": faces_of(swapped(state, (8, 9, 20)), 3)})
+    assert response.status_code == 400
+    assert served.get("/jobs/unknown").status_code == 404
+
+    monkeypatch.setattr(main.JOBS, "max_queued", 0)
+    response = served.post("/jobs", json={"faces": faces_of(state, 3)})
+    assert response.status_code == 429
@@ -0,0 +1,43 @@
+"""Canonical move successors and solution simplification."""
+
+import pytest
+
+from cube_solver import Cube3x3, Cube4x4
+
+
+@pytest.mark.parametrize("moves, simplified", [
+    ("R R", "R2"),
+    ("R R'", ""),
+    ("R2 R2", ""),
+    ("R2 R", "R'"),
+    ("U D U'", "D"),
+    ("R L R", "R2 L"),
+    ("R U R'", "R U R'"),
+    ("F R R' F'", ""),
+])
+def test_simplify_merges_and_cancels(moves, simplified):
+    optimizer = Cube3x3.move_optimizer()
+    assert ' '.join(optimizer.simplify(moves.split())) == simplified
+
+
+def test_simplify_steps_over_commuting_slices():
+    optimizer = Cube4x4.move_optimizer()
+    assert optimizer.simplify("R 2R 3R R'".split()) == ["2R", "3R"]
+    assert optimizer.simplify("2U U 2U'".split()) == ["U"]
+
+
+def test_simplify_keeps_the_cube_state():
+    cube = Cube3x3(Cube3x3("U" * 54).solved_state)
+    moves = "R R U D U' F2 F2 L R' L".split()
+    simplified = cube.move_optimizer().simplify(moves)
+    assert len(simplified) < len(moves)
+    assert str(cube.apply_sequence(cube.state, simplified)) == str(cube.apply_sequence(cube.state, moves))
+
+
+def test_canonical_sequences_order_commuting_faces():
+    optimizer = Cube3x3.move_optimizer()
+    assert optimizer.is_canonical("U D R".split())
+    assert not optimizer.is_canonical("D U R".split())
+    assert not optimizer.is_canonical("R R2".split())
+    # Each move is followed by the 15 moves on other faces, less the opposite face passed over
+    assert optimizer.branching_factor() == pytest.approx(13.348, abs=1e-3)
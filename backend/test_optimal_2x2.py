@@ -0,0 +1,35 @@
+"""Optimal 2x2 solving from the distance table."""
+
+import pytest
+
+import optimal_2x2
+from conftest import assert_solves, scramble, solve
+from cube_solver import Cube2x2
+
+
+def test_scramble_is_solved(client):
+    state = scramble(2, seed=2)
+    response = solve(client, state, 2)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert_solves(state, 2, body["solution"])
+    assert body["stats"]["optimal"]
+    assert body["stats"]["lookups"] > 0
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 5, 8])
+def test_solution_is_no_longer_than_the_scramble(depth):
+    states, _ = Cube2x2.random_states(Cube2x2("U" * 24).solved_state, 20, depth, seed=depth)
+    for state in states:
+        cube = Cube2x2(state.tobytes().decode("ascii"))
+        solution = cube.solve()
+        assert len(solution["moves"].split()) <= depth
+        assert_solves(str(cube.state), 2, solution["moves"])
+
+
+def test_distance_matches_a_known_optimum():
+    # R U R' U' has no shorter equivalent on a 2x2
+    cube = Cube2x2(Cube2x2("U" * 24).solved_state)
+    state = str(cube.apply_sequence(cube.state, "R U R' U'".split()))
+    moves, _ = optimal_2x2.solve(optimal_2x2.to_cubie(state))
+    assert len(moves) == 4
@@ -0,0 +1,47 @@
+"""3x3 searches split across the solver pool."""
+
+import asyncio
+
+import pytest
+
+import solver_pool
+from conftest import assert_solves, scramble, solve
+from solver_pool import solve_state_parallel
+
+
+def test_parallel_request_is_solved(client):
+    state = scramble(3, seed=60)
+    response = solve(client, state, 3, parallel=True)
+    assert response.status_code == 200, response.text
+    stats = response.json()["stats"]
+    assert stats["method"] == "Kociemba two-phase, parallel"
+    # One task per first move at and past the split depth
+    assert stats["subtrees"] >= 18
+    assert_solves(state, 3, response.json()["solution"])
+
+
+def test_progress_reports_each_depth_and_every_better_solution(client):
+    state = scramble(3, seed=61)
+    updates = []
+    solution = asyncio.run(solve_state_parallel(
+        state, max_moves=21, split_depth=0, progress=lambda **update: updates.append(update)))
+    depths = [u["depth"] for u in updates if "depth" in u]
+    assert depths == list(range(depths[0], depths[-1] + 1))
+    best = [u["best_moves"] for u in updates if "best_moves" in u]
+    assert best == sorted(best, reverse=True) and best[-1] <= 21
+    assert solution["stats"]["moves"] <= 21
+    assert_solves(state, 3, solution["moves"])
+
+
+def test_node_budget_spent_before_any_solution(client):
+    with pytest.raises(TimeoutError):
+        asyncio.run(solve_state_parallel(scramble(3, seed=62), max_nodes=1))
+
+
+def test_runs_sequentially_when_every_cancel_slot_is_taken(client, monkeypatch):
+    solver_pool.get_pool()
+    monkeypatch.setattr(solver_pool, "_FREE_SLOTS", [])
+    state = scramble(3, seed=63)
+    solution = asyncio.run(solve_state_parallel(state))
+    assert solution["stats"]["method"] == "Kociemba two-phase"
+    assert_solves(state, 3, solution["moves"])
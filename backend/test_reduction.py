@@ -0,0 +1,57 @@
+"""4x4 and 5x5 solving by reduction."""
+
+import pytest
+
+import reduction
+from conftest import assert_solves, scramble, solve, swapped
+from cube_geometry import MOVE_TABLES, symmetries
+from test_trajectory import replay
+
+
+@pytest.mark.parametrize("size", [4, 5])
+def test_scramble_is_solved(client, size):
+    state = scramble(size, seed=size)
+    response = solve(client, state, size)
+    assert response.status_code == 200, response.text
+    assert response.json()["stats"]["method"] == "Reduction"
+    assert_solves(state, size, response.json()["solution"])
+
+
+def test_flipped_wing_is_rejected(client):
+    # Swapping the two stickers of a UF wing flips it in place
+    response = solve(client, swapped(scramble(4, seed=7), (13, 33)), 4)
+    assert response.status_code == 400
+    assert "wing edge piece" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("size", [4, 5])
+def test_cached_conjugate_has_a_trajectory(client, size):
+    state = scramble(size, seed=90 + size)
+    assert solve(client, state, size).status_code == 200
+    # Conjugates turn the U, R and F slices the solver uses into D, L and B ones
+    for symmetry in symmetries(size)[1:8]:
+        conjugate = symmetry.apply(state)
+        response = solve(client, conjugate, size, trajectory=True)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["stats"]["cached"]
+        assert_solves(conjugate, size, body["solution"])
+        forward, _ = replay(body["trajectory"], body["solution"].split())
+        assert reduction.normalize_colors(forward[-1], size) == reduction.solved_state(size)
+
+
+@pytest.mark.parametrize("size", [4, 5])
+def test_every_slice_maps_onto_a_solver_move(size):
+    names = set(reduction.solver_moves(size))
+    for move, perm in MOVE_TABLES[size].items():
+        if move[0].isdigit() and not move.endswith(("w", "w2", "w'")):
+            mapped = reduction.solver_move(move, size)
+            assert mapped in names
+            assert (MOVE_TABLES[size][mapped] == perm).all()
+
+
+@pytest.mark.parametrize("size", [4, 5])
+def test_normalize_colors_ignores_the_color_scheme(size):
+    state = scramble(size, seed=93)
+    recolored = state.translate(str.maketrans("URFDLB", "FULBDR"))
+    assert reduction.normalize_colors(recolored, size) == reduction.normalize_colors(state, size)
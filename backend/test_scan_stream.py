@@ -0,0 +1,57 @@
+"""/scan-stream: frames in, classified grids out, with bad input answered instead of crashing."""
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from benchmarks.corpus import face_corpus
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return face_corpus(1, seed=1)[0]
+
+
+def test_frames_become_stable(client, frame):
+    data, colors = frame
+    with client.websocket_connect("/scan-stream?face=F&stable_frames=2") as ws:
+        ws.send_bytes(data)
+        first = ws.receive_json()
+        ws.send_bytes(data)
+        second = ws.receive_json()
+    assert first["face"] == "F" and first["colors"] == colors
+    assert (first["streak"], first["stable"]) == (1, False)
+    assert (second["streak"], second["stable"]) == (2, True)
+
+
+def test_control_messages_switch_face_or_get_an_error(client, frame):
+    data, colors = frame
+    with client.websocket_connect("/scan-stream") as ws:
+        ws.send_text("{bad")
+        assert ws.receive_json()["error"].startswith("Malformed message")
+        for text in ('{"face": "X"}', '[1]'):
+            ws.send_text(text)
+            assert ws.receive_json()["error"] == "Invalid face specified"
+        ws.send_text('{"face": "R"}')
+        ws.send_bytes(data)
+        result = ws.receive_json()
+    assert result["face"] == "R" and result["colors"] == colors
+
+
+def test_undecodable_frame_resets_the_streak(client, frame):
+    data, _ = frame
+    with client.websocket_connect("/scan-stream?stable_frames=1") as ws:
+        ws.send_bytes(b"not an image")
+        error = ws.receive_json()
+        ws.send_bytes(data)
+        result = ws.receive_json()
+    assert error["frame"] == 1 and "error" in error
+    assert result["frame"] == 2 and result["streak"] == 1
+
+
+@pytest.mark.parametrize("query", ["face=Q", "session=unknown"])
+def test_bad_parameters_close_the_socket(client, query):
+    with client.websocket_connect(f"/scan-stream?{query}") as ws:
+        assert "error" in ws.receive_json()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
@@ -0,0 +1,58 @@
+"""The solution cache: canonical forms, symmetric hits and the sqlite tier."""
+
+import sqlite3
+
+import pytest
+
+from conftest import assert_solves, scramble, solve
+from cube_geometry import symmetries
+from cube_solver import Cube3x3
+from solution_cache import SolutionCache, canonical_form
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_cache_hit_maps_back_through_symmetry(client, mirror):
+    state = scramble(3, seed=11 + mirror)
+    first = solve(client, state, 3).json()
+    assert not first["stats"].get("cached")
+
+    symmetry = next(s for s in symmetries(3)[1:] if s.mirror == mirror)
+    conjugate = symmetry.apply(state)
+    second = solve(client, conjugate, 3).json()
+    assert second["stats"]["cached"]
+    assert_solves(conjugate, 3, second["solution"])
+
+
+def test_recolored_cube_shares_the_entry():
+    state = scramble(3, seed=12)
+    recolored = state.translate(str.maketrans("URFDLB", "FULBDR"))
+    assert canonical_form(Cube3x3(recolored))[0] == canonical_form(Cube3x3(state))[0]
+
+
+def test_entries_expire():
+    cache = SolutionCache(ttl=0)
+    cache.put("key", {"moves": []})
+    assert cache.get("key") is None
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path):
+    path = tmp_path / "cache.db"
+    SolutionCache(db_path=path).put("key", {"moves": ["R"]})
+    restarted = SolutionCache(db_path=path)
+    assert restarted.get("key") == {"moves": ["R"]}
+    assert restarted.disk_hits == 1
+
+
+def test_sqlite_tier_drops_least_recently_used(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = SolutionCache(max_size=2, db_path=path, prune_interval=3600)
+    cache.put("a", {"moves": []})
+    cache.put("b", {"moves": []})
+    # Neither the hit on a nor the trim past max_size reach the file before the next write-back
+    cache.get("a")
+    cache.put("c", {"moves": []})
+    rows = lambda: {key for key, in sqlite3.connect(path).execute("SELECT key FROM solutions")}
+    assert rows() == {"a", "b", "c"}
+
+    cache.flush()
+    assert rows() == {"a", "c"}
@@ -0,0 +1,58 @@
+"""/solve-batch: many cube states in, one NDJSON line per state out."""
+
+import json
+
+import main
+from conftest import assert_solves, faces_of, scramble, swapped
+
+
+def post_batch(client, items, order="input", ndjson=False):
+    if ndjson:
+        body = "\n".join(json.dumps(item) for item in items)
+        headers = {"content-type": "application/x-ndjson"}
+    else:
+        body, headers = json.dumps(items), {"content-type": "application/json"}
+    response = client.post(f"/solve-batch?order={order}", content=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_results_follow_input_order(client):
+    states = [scramble(3, seed) for seed in range(20, 24)]
+    results = post_batch(client, [{"faces": faces_of(state, 3)} for state in states])
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    for state, result in zip(states, results):
+        assert_solves(state, 3, result["solution"])
+
+
+def test_completion_order_returns_every_item(client):
+    states = [scramble(2, seed) for seed in range(30, 34)]
+    items = [{"faces": faces_of(state, 2), "size": 2} for state in states]
+    results = post_batch(client, items, order="completion", ndjson=True)
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    for result in results:
+        assert_solves(states[result["index"]], 2, result["solution"])
+
+
+def test_bad_items_fail_alone(client):
+    good = scramble(3, seed=40)
+    items = [
+        {"faces": faces_of(good, 3)},
+        {"faces": faces_of(swapped(good, (8, 9, 20)), 3)},
+        {"faces": faces_of(good, 3), "size": 7},
+    ]
+    results = post_batch(client, items)
+    assert_solves(good, 3, results[0]["solution"])
+    assert results[1]["error"].startswith("Invalid cube state")
+    assert "2x2 to 5x5" in results[2]["error"]
+
+
+def test_malformed_and_oversized_batches_are_rejected(client, monkeypatch):
+    response = client.post("/solve-batch", content="[{", headers={"content-type": "application/json"})
+    assert response.status_code == 400
+    response = client.post("/solve-batch", json={"faces": {}})
+    assert response.status_code == 400
+
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    response = client.post("/solve-batch", json=[{}] * 3)
+    assert response.status_code == 413
@@ -0,0 +1,18 @@
+"""Validation of impossible cube states by /solve-cube."""
+
+import pytest
+
+from conftest import scramble, solve, swapped
+
+
+@pytest.mark.parametrize("size, cycles, message", [
+    (3, [(8, 9, 20)], "twisted in place"),            # URF corner twisted
+    (3, [(7, 19)], "flipped in place"),               # UF edge flipped
+    (3, [(7, 5), (19, 10)], "have been swapped"),     # UF and UR edges swapped
+    (2, [(3, 4, 9)], "twisted in place"),             # URF corner twisted
+])
+def test_impossible_cube_is_rejected(client, size, cycles, message):
+    response = solve(client, swapped(scramble(size, seed=7), *cycles), size)
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
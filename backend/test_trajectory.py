@@ -0,0 +1,54 @@
+"""Solution trajectories: every state along the solution as per-move sticker deltas."""
+
+import pytest
+
+from conftest import scramble, solve
+from solver_pool import CUBE_CLASSES
+
+
+def replay(trajectory, moves):
+    """Every state from the trajectory alone, stepping forward and then back again"""
+    state = list(trajectory["initial"])
+    forward = [''.join(state)]
+    for move, colors in zip(moves, trajectory["steps"]):
+        for i, color in zip(trajectory["changed"][move], colors):
+            state[i] = color
+        forward.append(''.join(state))
+    backward = [''.join(state)]
+    for move in reversed(moves):
+        # A step back moves each changed sticker's color to the sticker it came from
+        colors = [state[i] for i in trajectory["changed"][move]]
+        for i, color in zip(trajectory["sources"][move], colors):
+            state[i] = color
+        backward.append(''.join(state))
+    return forward, backward[::-1]
+
+
+@pytest.mark.parametrize("size", [2, 3])
+def test_trajectory_replays_the_solution(client, size):
+    state = scramble(size, seed=80)
+    body = solve(client, state, size, trajectory=True).json()
+    moves = body["solution"].split()
+    forward, backward = replay(body["trajectory"], moves)
+    assert forward == backward
+    assert body["trajectory"]["initial"] == state
+
+    cube = CUBE_CLASSES[size](state)
+    expected = [str(cube.state)]
+    for move in moves:
+        expected.append(str(cube.apply_move(expected[-1], move)))
+    assert forward == expected
+
+
+def test_trajectory_only_when_asked(client):
+    body = solve(client, scramble(3, seed=81), 3).json()
+    assert "trajectory" not in body
+
+
+def test_cached_solution_has_a_trajectory(client):
+    state = scramble(3, seed=82)
+    solve(client, state, 3)
+    body = solve(client, state, 3, trajectory=True).json()
+    assert body["stats"]["cached"]
+    forward, _ = replay(body["trajectory"], body["solution"].split())
+    assert CUBE_CLASSES[3](forward[-1]).is_solved()
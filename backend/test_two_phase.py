@@ -0,0 +1,40 @@
+"""Two-phase 3x3 solving, directly and through /solve-cube."""
+
+import pytest
+
+import two_phase
+from conftest import assert_solves, scramble, solve
+from cube_solver import Cube3x3
+
+
+@pytest.mark.parametrize("seed", [3, 4])
+def test_scramble_is_solved(client, seed):
+    state = scramble(3, seed)
+    response = solve(client, state, 3)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert_solves(state, 3, body["solution"])
+    assert body["stats"]["method"] == "Kociemba two-phase"
+    assert body["stats"]["moves"] == len(body["solution"].split())
+
+
+def test_solved_cube_needs_no_moves():
+    cube = Cube3x3(Cube3x3("U" * 54).solved_state)
+    assert cube.solve()["moves"] == ""
+
+
+def test_max_moves_keeps_searching_for_shorter_solutions():
+    cube = Cube3x3(scramble(3, seed=5))
+    first = cube.solve()
+    shorter = cube.solve(max_moves=first["stats"]["moves"] - 1)
+    assert shorter["stats"]["moves"] < first["stats"]["moves"]
+    assert_solves(str(cube.state), 3, shorter["moves"])
+
+
+def test_phase1_ends_in_the_subgroup():
+    cube = Cube3x3(scramble(3, seed=6))
+    phase1, phase2, _ = two_phase.solve(cube.to_cubie())
+    after = Cube3x3(str(cube.apply_sequence(cube.state, phase1))).to_cubie()
+    # <U, D, R2, L2, F2, B2>: no twist, no flip and the E-slice edges in the E slice
+    assert not any(after.co) and not any(after.eo)
+    assert set(after.ep[8:]) == {8, 9, 10, 11}
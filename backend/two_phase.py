@@ -0,0 +1,398 @@
+"""Kociemba two-phase search over integer coordinates.
+
+Phase 1 brings the cube into the subgroup <U, D, R2, L2, F2, B2> (corner twist,
+edge flip and UD-slice coordinates all zero), phase 2 solves it with moves of
+that subgroup (corner, UD-edge and slice permutation coordinates).
+"""
+
+import time
+from itertools import combinations, permutations
+
+import numpy as np
+
+from cubie import (
+    BASIC_MOVES, FACES, MOVE_CUBES, MOVE_NAMES, CubieCube,
+    N_CORNERS, N_FLIP, N_SLICE, N_SLICE_SORTED, N_TWIST, N_UD_EDGES,
+)
+from pattern_db import build_pruning_table, load_tables
+from search_budget import BudgetExceeded, SearchBudget
+
+N_MOVES = 18
+# Moves allowed in phase 2, as indices into MOVE_NAMES
+PHASE2_MOVES = [0, 1, 2, 4, 7, 9, 10, 11, 13, 16]
+N_PHASE2_MOVES = len(PHASE2_MOVES)
+
+MAX_LENGTH = 24
+# Phase 2 is tried with a shallow cap first; most phase 1 solutions admit a short phase 2
+PHASE2_DEPTH = 12
+
+TABLE_GROUP = "two_phase"
+TABLE_NAMES = [
+    "twist_move", "flip_move", "slice_move", "corners_move", "ud_edges_move", "slice_sorted_move",
+    "slice_twist_prune", "slice_flip_prune", "corners_prune", "ud_edges_prune",
+]
+# Pruning tables are stored two distances per byte
+PACKED_TABLES = {"slice_twist_prune": 4, "slice_flip_prune": 4, "corners_prune": 4, "ud_edges_prune": 4}
+
+
+def rank_rows(perms):
+    """Lexicographic rank of every row of an (n, k) array of permutations"""
+    k = perms.shape[1]
+    ranks = np.zeros(len(perms), dtype=np.int64)
+    for i in range(k):
+        smaller = (perms[:, i + 1:] < perms[:, i:i + 1]).sum(axis=1)
+        ranks = ranks * (k - i) + smaller
+    return ranks
+
+
+def _power_columns(quarter_table):
+    """Extend a (n, 6) quarter-turn table to all 18 moves"""
+    n = len(quarter_table)
+    table = np.empty((n, N_MOVES), dtype=quarter_table.dtype)
+    for face in range(6):
+        q = quarter_table[:, face]
+        table[:, face * 3] = q
+        table[:, face * 3 + 1] = q[q]
+        table[:, face * 3 + 2] = q[q[q]]
+    return table
+
+
+def _twist_move_table():
+    digits = np.arange(N_TWIST)[:, None] // 3 ** np.arange(6, -1, -1) % 3
+    co = np.hstack([digits, (-digits.sum(axis=1) % 3)[:, None]])
+    quarter = np.empty((N_TWIST, 6), dtype=np.uint16)
+    for f, face in enumerate(FACES):
+        move = BASIC_MOVES[face]
+        new_co = (co[:, move.cp] + move.co) % 3
+        quarter[:, f] = new_co[:, :7] @ 3 ** np.arange(6, -1, -1)
+    return _power_columns(quarter)
+
+
+def _flip_move_table():
+    digits = np.arange(N_FLIP)[:, None] // 2 ** np.arange(10, -1, -1) % 2
+    eo = np.hstack([digits, (digits.sum(axis=1) % 2)[:, None]])
+    quarter = np.empty((N_FLIP, 6), dtype=np.uint16)
+    for f, face in enumerate(FACES):
+        move = BASIC_MOVES[face]
+        new_eo = (eo[:, move.ep] + move.eo) % 2
+        quarter[:, f] = new_eo[:, :11] @ 2 ** np.arange(10, -1, -1)
+    return _power_columns(quarter)
+
+
+def _slice_move_table():
+    cubes = {}
+    for positions in combinations(range(12), 4):
+        cube = CubieCube(ep=[0] * 12)
+        others = iter(range(8))
+        slice_edges = iter(range(8, 12))
+        cube.ep = [next(slice_edges) if i in positions else next(others) for i in range(12)]
+        cubes[cube.get_slice()] = cube
+    quarter = np.empty((N_SLICE, 6), dtype=np.uint16)
+    for s, cube in cubes.items():
+        for f, face in enumerate(FACES):
+            quarter[s, f] = cube.multiply(BASIC_MOVES[face]).get_slice()
+    return _power_columns(quarter)
+
+
+def _permutation_move_table(n_items, face_perms):
+    """Phase 2 move table of a permutation coordinate over n_items pieces"""
+    perms = np.array(list(permutations(range(n_items))), dtype=np.int8)
+    table = np.empty((len(perms), N_PHASE2_MOVES), dtype=np.uint16)
+    for col, m in enumerate(PHASE2_MOVES):
+        table[:, col] = rank_rows(perms[:, face_perms[m]])
+    return table
+
+
+def _phase2_move_tables():
+    corner_perms = [np.array(cube.cp) for cube in MOVE_CUBES]
+    # Phase 2 moves keep the UD edges in positions 0-7 and the slice edges in 8-11
+    ud_perms = [np.array(cube.ep[:8]) for cube in MOVE_CUBES]
+    slice_perms = [np.array(cube.ep[8:]) - 8 for cube in MOVE_CUBES]
+    return (
+        _permutation_move_table(8, corner_perms),
+        _permutation_move_table(8, ud_perms),
+        _permutation_move_table(4, slice_perms),
+    )
+
+
+def build_tables():
+    twist_move = _twist_move_table()
+    flip_move = _flip_move_table()
+    slice_move = _slice_move_table()
+    corners_move, ud_edges_move, slice_sorted_move = _phase2_move_tables()
+    return {
+        "twist_move": twist_move,
+        "flip_move": flip_move,
+        "slice_move": slice_move,
+        "corners_move": corners_move,
+        "ud_edges_move": ud_edges_move,
+        "slice_sorted_move": slice_sorted_move,
+        "slice_twist_prune": build_pruning_table(N_TWIST, twist_move, N_SLICE, slice_move),
+        "slice_flip_prune": build_pruning_table(N_FLIP, flip_move, N_SLICE, slice_move),
+        "corners_prune": build_pruning_table(N_SLICE_SORTED, slice_sorted_move, N_CORNERS, corners_move),
+        "ud_edges_prune": build_pruning_table(N_SLICE_SORTED, slice_sorted_move, N_UD_EDGES, ud_edges_move),
+    }
+
+
+_TABLES = None
+
+
+def _nibble(table, i):
+    return table[i >> 1] >> ((i & 1) << 2) & 15
+
+
+def get_tables():
+    """Memory-mapped move and pruning tables, flattened for fast indexing"""
+    global _TABLES
+    if _TABLES is None:
+        tables = load_tables(TABLE_GROUP, TABLE_NAMES, build_tables, PACKED_TABLES)
+        _TABLES = {name: memoryview(table.reshape(-1)) for name, table in tables.items()}
+    return _TABLES
+
+
+class _Search:
+    """Anytime two-phase search: every solution found lowers the length bound for the rest"""
+
+    def __init__(self, cube, max_length, phase2_depth, target_length, budget, prefix=(), depth=None,
+                 profile=False):
+        tables = get_tables()
+        self.twist_move = tables["twist_move"]
+        self.flip_move = tables["flip_move"]
+        self.slice_move = tables["slice_move"]
+        self.corners_move = tables["corners_move"]
+        self.ud_edges_move = tables["ud_edges_move"]
+        self.slice_sorted_move = tables["slice_sorted_move"]
+        self.slice_twist_prune = tables["slice_twist_prune"]
+        self.slice_flip_prune = tables["slice_flip_prune"]
+        self.corners_prune = tables["corners_prune"]
+        self.ud_edges_prune = tables["ud_edges_prune"]
+        self.cube = cube
+        self.max_length = max_length
+        self.phase2_depth = phase2_depth
+        self.target_length = target_length
+        self.budget = budget
+        # Only phase 1 sequences that start with prefix (and are exactly depth long, if given) are searched
+        self.prefix = list(prefix)
+        self.min_depth = 0 if depth is None else depth
+        self.max_depth = max_length if depth is None else depth
+        self.path1 = list(prefix)
+        self.path2 = []
+        self.best = None
+        self.nodes = 0
+        self.check_at = budget.next_check(0)
+        self.depth = 0
+        self.truncated = False
+        # Instrumentation: nodes per phase 1 depth, and only when profiling (it slows the
+        # inner loops) pruning-table probes and seconds spent in phase 2
+        self.profile = profile
+        self.lookups = 0
+        self.nodes_per_depth = {}
+        self.phase2_time = 0.0
+
+    def run(self):
+        """Search until a solution within target_length is found, the space is exhausted
+        or the budget runs out; the shortest solution seen is left in self.best"""
+        twist = self.cube.get_twist()
+        flip = self.cube.get_flip()
+        slice_ = self.cube.get_slice()
+        for m in self.prefix:
+            twist = self.twist_move[twist * N_MOVES + m]
+            flip = self.flip_move[flip * N_MOVES + m]
+            slice_ = self.slice_move[slice_ * N_MOVES + m]
+        last_face = self.prefix[-1] // 3 if self.prefix else -1
+        togo = max(_nibble(self.slice_twist_prune, slice_ * N_TWIST + twist),
+                   _nibble(self.slice_flip_prune, slice_ * N_FLIP + flip),
+                   self.min_depth - len(self.prefix))
+        try:
+            while len(self.prefix) + togo <= min(self.max_length, self.max_depth):
+                depth = self.depth = len(self.prefix) + togo
+                nodes = self.nodes
+                try:
+                    if self._phase1(twist, flip, slice_, togo, last_face):
+                        break
+                finally:
+                    self.nodes_per_depth[depth] = self.nodes - nodes
+                togo += 1
+        except BudgetExceeded:
+            self.truncated = True
+        return self.best
+
+    def _phase1(self, twist, flip, slice_, togo, last_face):
+        self.nodes += 1
+        if self.nodes >= self.check_at:
+            self.check_at = self.budget.check(self.nodes)
+        if togo == 0:
+            # A phase 2 move at the end of phase 1 would just be absorbed by phase 2
+            if self.path1 and self.path1[-1] in _PHASE2_MOVE_SET:
+                return False
+            if not self.profile:
+                return self._start_phase2()
+            start = time.perf_counter()
+            try:
+                return self._start_phase2()
+            finally:
+                self.phase2_time += time.perf_counter() - start
+        profile = self.profile
+        if profile:
+            self.lookups += _PHASE1_FANOUT[last_face]
+        twist_move = self.twist_move
+        flip_move = self.flip_move
+        slice_move = self.slice_move
+        slice_twist_prune = self.slice_twist_prune
+        slice_flip_prune = self.slice_flip_prune
+        twist *= N_MOVES
+        flip *= N_MOVES
+        slice_ *= N_MOVES
+        for m, face in _PHASE1_STEPS:
+            if face == last_face or face == last_face - 3:
+                continue
+            slice1 = slice_move[slice_ + m]
+            twist1 = twist_move[twist + m]
+            i = slice1 * N_TWIST + twist1
+            if (slice_twist_prune[i >> 1] >> ((i & 1) << 2) & 15) >= togo:
+                continue
+            if profile:
+                self.lookups += 1
+            flip1 = flip_move[flip + m]
+            i = slice1 * N_FLIP + flip1
+            if (slice_flip_prune[i >> 1] >> ((i & 1) << 2) & 15) >= togo:
+                continue
+            self.path1.append(m)
+            if self._phase1(twist1, flip1, slice1, togo - 1, face):
+                return True
+            self.path1.pop()
+        return False
+
+    def _start_phase2(self):
+        """Shortest phase 2 for the current phase 1; True once the target length is met"""
+        cube = self.cube.apply_sequence(self.path1)
+        corners = cube.get_corners()
+        ud_edges = cube.get_ud_edges()
+        slice_sorted = cube.get_slice_sorted()
+        h = max(_nibble(self.corners_prune, corners * N_SLICE_SORTED + slice_sorted),
+                _nibble(self.ud_edges_prune, ud_edges * N_SLICE_SORTED + slice_sorted))
+        last_face = self.path1[-1] // 3 if self.path1 else -1
+        for depth in range(h, min(self.max_length - len(self.path1), self.phase2_depth) + 1):
+            if self._phase2(corners, ud_edges, slice_sorted, depth, last_face):
+                self.best = (list(self.path1), list(self.path2))
+                length = len(self.path1) + len(self.path2)
+                self.path2 = []
+                # Only strictly shorter solutions are worth finding from here on
+                self.max_length = length - 1
+                return length <= self.target_length
+        return False
+
+    def _phase2(self, corners, ud_edges, slice_sorted, togo, last_face):
+        self.nodes += 1
+        if self.nodes >= self.check_at:
+            self.check_at = self.budget.check(self.nodes)
+        if togo == 0:
+            return True
+        profile = self.profile
+        if profile:
+            self.lookups += _PHASE2_FANOUT[last_face]
+        corners_move = self.corners_move
+        ud_edges_move = self.ud_edges_move
+        slice_sorted_move = self.slice_sorted_move
+        corners_prune = self.corners_prune
+        ud_edges_prune = self.ud_edges_prune
+        corners *= N_PHASE2_MOVES
+        ud_edges *= N_PHASE2_MOVES
+        slice_sorted *= N_PHASE2_MOVES
+        for col, m, face in _PHASE2_STEPS:
+            if face == last_face or face == last_face - 3:
+                continue
+            slice_sorted1 = slice_sorted_move[slice_sorted + col]
+            corners1 = corners_move[corners + col]
+            i = corners1 * N_SLICE_SORTED + slice_sorted1
+            if (corners_prune[i >> 1] >> ((i & 1) << 2) & 15) >= togo:
+                continue
+            if profile:
+                self.lookups += 1
+            ud_edges1 = ud_edges_move[ud_edges + col]
+            i = ud_edges1 * N_SLICE_SORTED + slice_sorted1
+            if (ud_edges_prune[i >> 1] >> ((i & 1) << 2) & 15) >= togo:
+                continue
+            self.path2.append(m)
+            if self._phase2(corners1, ud_edges1, slice_sorted1, togo - 1, face):
+                return True
+            self.path2.pop()
+        return False
+
+
+_PHASE1_STEPS = [(m, m // 3) for m in range(N_MOVES)]
+_PHASE2_STEPS = [(col, m, m // 3) for col, m in enumerate(PHASE2_MOVES)]
+_PHASE2_MOVE_SET = frozenset(PHASE2_MOVES)
+# Children tried after a move on each face; index -1 is the root, where nothing is skipped
+_PHASE1_FANOUT = [sum(1 for _, f in _PHASE1_STEPS if f != face and f != face - 3) for face in range(6)] + [N_MOVES]
+_PHASE2_FANOUT = ([sum(1 for _, _, f in _PHASE2_STEPS if f != face and f != face - 3) for face in range(6)]
+                  + [N_PHASE2_MOVES])
+
+
+def root_prefixes(depth):
+    """Every phase 1 move sequence of the given length that the search itself could generate"""
+    prefixes = [()]
+    for _ in range(depth):
+        prefixes = [prefix + (m,) for prefix in prefixes for m, face in _PHASE1_STEPS
+                    if not prefix or (face != prefix[-1] // 3 and face != prefix[-1] // 3 - 3)]
+    return prefixes
+
+
+def _search_stats(search):
+    stats = {
+        "nodes": search.nodes,
+        "depth": search.depth,
+        "truncated": search.truncated,
+        "nodes_per_depth": search.nodes_per_depth,
+    }
+    if search.profile:
+        stats.update(lookups=search.lookups, phase2_time=search.phase2_time)
+    return stats
+
+
+def _named(best):
+    if best is None:
+        return None, None
+    phase1, phase2 = best
+    return [MOVE_NAMES[m] for m in phase1], [MOVE_NAMES[m] for m in phase2]
+
+
+def search_subtree(cube, prefix, depth, max_length=MAX_LENGTH, target_length=None, budget=None, profile=False):
+    """One iteration of solve() restricted to phase 1 sequences of depth moves starting with prefix.
+
+    Splitting each iteration into subtrees lets several processes search one
+    cube: for depth >= k the subtrees below root_prefixes(k) cover the whole
+    iteration, shallower ones are a single search from the prefix ().
+    """
+    budget = budget or SearchBudget()
+    target_length = max_length if target_length is None else target_length
+    search = _Search(cube, max_length, PHASE2_DEPTH, target_length, budget, prefix, depth, profile)
+    phase1, phase2 = _named(search.run())
+    return phase1, phase2, _search_stats(search)
+
+
+def solve(cube, max_length=MAX_LENGTH, target_length=None, budget=None, profile=False):
+    """Solve a CubieCube, returning (phase1_moves, phase2_moves, stats).
+
+    The first solution found is returned unless target_length asks for a shorter
+    one, in which case the search keeps improving until it reaches target_length,
+    exhausts max_length or spends its budget. The moves are None if no solution
+    was found. stats holds the nodes expanded, the phase 1 depth reached and
+    whether the budget cut the search short; with profile, also the
+    pruning-table lookups and the seconds spent in phase 2.
+    """
+    budget = budget or SearchBudget()
+    target_length = max_length if target_length is None else target_length
+    search = _Search(cube, max_length, PHASE2_DEPTH, target_length, budget, profile=profile)
+    best = search.run()
+    if best is None and not search.truncated:
+        # Rare positions need a phase 2 longer than the shallow cap
+        retry = _Search(cube, max_length, max_length, target_length, budget, profile=profile)
+        retry.nodes = retry.check_at = search.nodes
+        retry.lookups, retry.phase2_time = search.lookups, search.phase2_time
+        best = retry.run()
+        for depth, nodes in search.nodes_per_depth.items():
+            retry.nodes_per_depth[depth] = retry.nodes_per_depth.get(depth, 0) + nodes
+        search = retry
+    phase1, phase2 = _named(best)
+    return phase1, phase2, _search_stats(search)
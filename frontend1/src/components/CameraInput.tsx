@@ -22,6 +22,7 @@ const CameraInput: React.FC<CameraInputProps> = ({ onSubmit }) => {
   const [isCapturing, setIsCapturing] = useState(false);
   const [cameraActive, setCameraActive] = useState(false);
   const [detectedColors, setDetectedColors] = useState<ColorKey[]>([]);
+  const [previewImage, setPreviewImage] = useState<string | undefined>();
 
   // Initialize camera using service
   const startCamera = useCallback(async () => {
@@ -73,11 +74,13 @@ const CameraInput: React.FC<CameraInputProps> = ({ onSubmit }) => {
 
     // Use backend for detection
     try {
-      const colors = await cameraService.detectColorsWithBackend(imageData, currentFace);
-      setDetectedColors(colors);
+      const result = await cameraService.detectFaceWithBackend(imageData, currentFace);
+      setDetectedColors(result.colors);
+      setPreviewImage(result.preview);
     } catch (e) {
       alert('Failed to detect colors using backend.');
       setDetectedColors([]);
+      setPreviewImage(undefined);
     }
     setIsCapturing(false);
   }, [currentFace]);
@@ -92,6 +95,7 @@ const CameraInput: React.FC<CameraInputProps> = ({ onSubmit }) => {
     }));
 
     setDetectedColors([]);
+    setPreviewImage(undefined);
   }, [detectedColors, currentFace, setCubeState]);
 
   // Submit cube configuration
@@ -204,7 +208,14 @@ const CameraInput: React.FC<CameraInputProps> = ({ onSubmit }) => {
           {detectedColors.length > 0 && (
             <div className="space-y-3">
               <h3 className="text-sm font-medium text-muted-foreground">Detected Colors</h3>
-              <div className="flex justify-center">
+              <div className="flex justify-center items-center gap-4">
+                {previewImage && (
+                  <img
+                    src={previewImage}
+                    alt={`Scanned ${currentFace} face`}
+                    className="w-24 h-24 rounded-md border-2 border-muted object-cover"
+                  />
+                )}
                 <div className="grid grid-cols-3 gap-1 p-4 bg-muted/20 rounded-lg border-2 border-dashed border-muted">
                   {detectedColors.map((color, index) => (
                     <div
@@ -220,7 +231,7 @@ const CameraInput: React.FC<CameraInputProps> = ({ onSubmit }) => {
                 <Button onClick={applyColors} className="flex items-center gap-2">
                   Apply to {currentFace} Face
                 </Button>
-                <Button onClick={() => setDetectedColors([])} variant="outline">
+                <Button onClick={() => { setDetectedColors([]); setPreviewImage(undefined); }} variant="outline">
                   <RefreshCw className="w-4 h-4" />
                 </Button>
               </div>
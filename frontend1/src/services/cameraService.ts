@@ -9,6 +9,12 @@ export interface ColorDetectionResult {
   timestamp: number;
 }
 
+export interface FaceDetectionResult {
+  colors: ColorKey[];
+  confidences: number[];
+  preview?: string;
+}
+
 export interface CameraConfig {
   width: number;
   height: number;
@@ -89,6 +95,16 @@ class CameraService {
 
   // Advanced color detection with backend OpenCV
   async detectColorsWithBackend(imageData: ImageData, face: string): Promise<string[]> {
+    const result = await this.detectFaceWithBackend(imageData, face, { includeImage: false });
+    return result.colors;
+  }
+
+  // Backend detection that can also return a small JPEG preview of the warped face
+  async detectFaceWithBackend(
+    imageData: ImageData,
+    face: string,
+    { includeImage = true, thumbnail = 96 }: { includeImage?: boolean; thumbnail?: number } = {}
+  ): Promise<FaceDetectionResult> {
     const canvas = document.createElement('canvas');
     const ctx = canvas.getContext('2d');
     canvas.width = imageData.width;
@@ -98,12 +114,21 @@ class CameraService {
     const formData = new FormData();
     formData.append('file', blob, 'face.jpg');
     formData.append('face', face);
-    const response = await fetch('/api/process-face', {
+    const params = new URLSearchParams(
+      includeImage
+        ? { image_format: 'jpeg', thumbnail: String(thumbnail) }
+        : { include_image: 'false' }
+    );
+    const response = await fetch(`/api/process-face?${params}`, {
       method: 'POST',
       body: formData
     });
     const data = await response.json();
-    return data.colors;
+    return {
+      colors: data.colors,
+      confidences: data.confidences ?? [],
+      preview: data.processed_image ? `data:image/jpeg;base64,${data.processed_image}` : undefined
+    };
   }
 
   // Simple RGB-based color detection